@@ -19,6 +19,78 @@ class Settings(BaseSettings):
     mail_starttls: bool
     mail_ssl_tls: bool
     mail_validate_certs: bool
+    mail_pool_size: int = 4  # Nombre max de connexions SMTP ouvertes
+    mail_idle_timeout: float = 60.0  # Une connexion inutilisée plus longtemps est refermée
+    mail_concurrency: int = 4  # Nombre max de résumés envoyés en parallèle
+
+    # Tampon d'écriture des clics (désactivé par défaut)
+    click_buffer_enabled: bool = False
+    click_buffer_max_keys: int = 10000  # Nombre max de couples (projet, utilisateur) en attente
+    click_buffer_flush_interval: float = 2.0  # Secondes entre deux écritures
+
+    # Mots de passe : hachage bcrypt dans un pool de threads
+    password_bcrypt_rounds: int = 12  # Facteur de coût, les anciens hash sont recalculés à la connexion
+    password_workers: int = 2
+    password_max_pending: int = 8  # Calculs en cours ou en attente max avant de répondre 503
+
+    # Limitation de débit des routes publiques (requêtes par minute, 0 = pas de limite)
+    rate_limit_enabled: bool = True
+    rate_limit_max_keys: int = 100000  # Seaux gardés en mémoire, les moins récemment utilisés sont oubliés
+    # En-tête posé par le reverse proxy de confiance avec l'adresse du client ("X-Forwarded-For", "X-Real-IP"...).
+    # Vide : adresse de la connexion, qui derrière un proxy est celle du proxy (limite par IP commune à tous).
+    rate_limit_ip_header: str = ""
+    rate_limit_thank_you_ip: float = 300.0
+    rate_limit_thank_you_user: float = 60.0  # Par user_id d'un projet
+    rate_limit_thank_you_project: float = 3000.0
+    rate_limit_message_ip: float = 30.0
+    rate_limit_message_user: float = 5.0
+    rate_limit_message_project: float = 300.0
+
+    # Cache (dev_id, nom du projet) -> id du projet
+    project_cache_size: int = 10000
+    project_cache_ttl: float = 300.0
+    project_cache_negative_ttl: float = 30.0  # Durée de vie des projets inexistants en cache
+
+    # Cache des fiches développeur (DeveloperDetailedResponse)
+    developer_cache_size: int = 10000
+    developer_cache_ttl: float = 60.0
+
+    # Cache des réponses du tableau de bord, indexé par version (ETag).
+    # Les versions sont propres au processus : avec plusieurs workers, le TTL (aussi présent dans l'ETag) borne le retard.
+    response_cache_size: int = 10000
+    response_cache_ttl: float = 60.0
+
+    # Worker de l'outbox des notifications
+    outbox_batch_size: int = 50
+    outbox_concurrency: int = 5  # Nombre max de mails envoyés en parallèle
+    outbox_poll_interval: float = 2.0
+    outbox_max_attempts: int = 5
+    outbox_retry_base_delay: float = 30.0  # Délai avant la 1re relance, doublé à chaque échec
+    outbox_lease_seconds: float = 300.0  # Durée de réservation d'un lot par un worker
+    instant_thank_you_window_minutes: float = 5.0  # Les mercis d'un développeur sont regroupés sur cette fenêtre
+
+    # Planificateur des résumés (remplace l'appel externe à /triggerwebcron)
+    summary_scheduler_enabled: bool = False
+    summary_shards: int = 24  # Les développeurs sont répartis en shards (id modulo summary_shards)
+    summary_tick_seconds: float = 3600.0  # Un shard est traité par créneau : cycle complet = shards * tick
+    summary_items_per_project: int = 10  # Messages et sessions de clics max par projet dans un résumé
+
+    # Compaction des clics (python manage.py compact-clicks)
+    click_retention_days: int = 90  # Les clics plus anciens sont regroupés par jour et archivés (15 minimum)
+    click_archive_dir: str = "archives"  # Archives NDJSON gzip, une par mois
+
+    # Classement des meilleurs soutiens : nombre de user_id suivis par projet (Space-Saving)
+    top_supporters_capacity: int = 100
+
+    # Flux d'événements temps réel du tableau de bord (SSE)
+    events_queue_size: int = 100  # Événements en attente max par client avant de l'abandonner
+    events_max_subscribers: int = 5  # Flux ouverts max par développeur
+    events_heartbeat_seconds: float = 15.0
+    events_token_ttl_seconds: int = 60  # Durée de validité d'un jeton d'ouverture de flux
+
+    # Pagination des messages et sessions de clics
+    page_size_default: int = 20
+    page_size_max: int = 100
 
 
 settings = Settings()
\ No newline at end of file
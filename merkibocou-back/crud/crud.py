@@ -1,22 +1,52 @@
+import base64
+import heapq
+import html
 import logging
+import re
+import uuid
 from datetime import timedelta
 import datetime
-from typing import Any
+from typing import Any, Callable
 
 from fastapi import HTTPException, status
-from sqlalchemy import desc, case, and_
+from sqlalchemy import desc, case, and_, insert, tuple_, update, delete, func, union_all, literal, cast, null, \
+    Text, Integer, type_coerce, event, table, column, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from passlib.hash import bcrypt
 
+from config import settings
 from models.projects import Project
 from models.messages import Message
 from models.developers import Developer
 from models.thank_you_clicks import ThankYouClick
+from models.notification_outbox import NotificationOutbox
+from models.scheduler_locks import SchedulerLock
+from models.project_stats import ProjectStats
+from models.project_rollups import ProjectRollup
+from models.click_archive_days import ClickArchiveDay
 from schemas import schemas
 from schemas.schemas import ThankYouOut, MessageOut, ProjectMailSummary, DeveloperMailSummaryResponse, ProjectResponse, \
     DeveloperDetailedResponse
+from services.cache import TTLCache, MISSING
+from services.versions import versions
+from services.events import event_broker
+from services.hll import HyperLogLog
+from services.heavy_hitters import SpaceSaving
+from services.passwords import password_hasher
+
+# Cache (dev_id, nom du projet) -> id du projet (ou None si le projet n'existe pas)
+project_id_cache = TTLCache(max_size=settings.project_cache_size, ttl=settings.project_cache_ttl)
+# Cache id du développeur -> DeveloperDetailedResponse
+developer_cache = TTLCache(max_size=settings.developer_cache_size, ttl=settings.developer_cache_ttl)
+
+
+def _utcnow() -> datetime.datetime:
+    """
+    Date courante en UTC sans fuseau, comme les dates stockées en base.
+    """
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
 
 
 # ---- DEVELOPERS ----
@@ -25,7 +55,7 @@ async def create_developer(db: AsyncSession, developer: schemas.DeveloperCreate)
     """
     Crée un nouveau développeur avec un mot de passe hashé.
     """
-    hashed_password = bcrypt.hash(developer.password)
+    hashed_password = await password_hasher.hash(developer.password)
     dev = Developer(username=developer.username, hashed_password=hashed_password, email=developer.email)
     db.add(dev)
     await db.commit()
@@ -36,12 +66,20 @@ async def create_developer(db: AsyncSession, developer: schemas.DeveloperCreate)
 async def authenticate_developer(db: AsyncSession, username: str, password: str):
     """
     Authentifie un développeur en vérifiant son mot de passe.
+    Un hash calculé avec un ancien facteur de coût est remplacé par un hash au facteur configuré.
     """
     result = await db.execute(select(Developer).filter(Developer.username == username))
     dev = result.scalars().first()
-    if dev and bcrypt.verify(password, dev.hashed_password):
-        return dev
-    return None
+    if dev is None:
+        return None
+    valid, new_hash = await password_hasher.verify_and_update(password, dev.hashed_password)
+    if not valid:
+        return None
+    if new_hash is not None:
+        dev.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(dev)
+    return dev
 
 
 async def get_developer_by_username(db: AsyncSession, username: str):
@@ -51,15 +89,44 @@ async def get_developer_by_username(db: AsyncSession, username: str):
     result = await db.execute(select(Developer).filter(Developer.username == username))
     return result.scalars().first()
 
-async def get_developer_by_id(db: AsyncSession, id: int) -> DeveloperDetailedResponse:
+async def get_developer_by_id(db: AsyncSession, id: int) -> DeveloperDetailedResponse | None:
     """
-    Récupère un développeur par son nom d'utilisateur.
+    Récupère un développeur par son id.
+
+    Passe par `developer_cache` : toute modification du développeur doit appeler `invalidate_developer`.
     """
+    cached_dev = developer_cache.get(id)
+    if cached_dev is not MISSING:
+        return cached_dev
     result = await db.execute(select(Developer).filter(Developer.id == id))
     dev: Developer = result.scalars().first()
-    return DeveloperDetailedResponse(id=dev.id, username=dev.username, email=dev.email,
-                                     instant_messages=dev.instant_messages, instant_thank_you=dev.instant_thank_you,
-                                     summary_frequency=dev.summary_frequency, last_summary_sent=dev.last_summary_sent)
+    if not dev:
+        return None
+    dev_response = DeveloperDetailedResponse(id=dev.id, username=dev.username, email=dev.email,
+                                             instant_messages=dev.instant_messages, instant_thank_you=dev.instant_thank_you,
+                                             summary_frequency=dev.summary_frequency, last_summary_sent=dev.last_summary_sent)
+    developer_cache.set(id, dev_response)
+    return dev_response
+
+
+def invalidate_developer(id: int):
+    """
+    Retire un développeur du cache après une modification de sa fiche.
+    """
+    developer_cache.invalidate(id)
+
+
+async def update_developer_preferences(db: AsyncSession, id: int,
+                                       preferences: schemas.DeveloperUpdatePreference) -> DeveloperDetailedResponse | None:
+    """
+    Met à jour les préférences de notification d'un développeur (les champs à None sont ignorés).
+    """
+    values = preferences.model_dump(exclude_none=True)
+    if values:
+        await db.execute(update(Developer).filter(Developer.id == id).values(**values))
+        await db.commit()
+        invalidate_developer(id)
+    return await get_developer_by_id(db, id)
 
 
 # ---- PROJECTS ----
@@ -71,8 +138,13 @@ async def create_project(db: AsyncSession, developer_id: int, project: schemas.P
     new_project = Project(name=project.name, developer_id=developer_id)
     db.add(new_project)
     try:
+        await db.flush()
+        db.add(ProjectStats(project_id=new_project.id, total_clicks=0, total_messages=0, click_sessions=0,
+                            supporters=HyperLogLog().to_blob(), top_supporters=_new_top_supporters().to_json()))
         await db.commit()
         await db.refresh(new_project)
+        project_id_cache.set((developer_id, new_project.name), new_project.id)
+        versions.bump(developer_ids=[developer_id])
         return ProjectResponse(id=new_project.id, name=new_project.name, dev_id=new_project.developer_id)
     except IntegrityError:
         await db.rollback()
@@ -103,12 +175,366 @@ async def get_project_by_name_and_developer(db: AsyncSession, project_name: str,
     return result.scalars().first()
 
 
-async def get_projects_by_developer(db: AsyncSession, developer_id: int):
+def _cache_project_id(developer_id: int, project_name: str, project_id: int | None):
+    ttl = settings.project_cache_negative_ttl if project_id is None else None
+    project_id_cache.set((developer_id, project_name), project_id, ttl=ttl)
+
+
+async def resolve_project_id(db: AsyncSession, project_name: str, developer_id: int) -> int | None:
+    """
+    Retourne l'id d'un projet à partir de son nom et de son développeur, ou None s'il n'existe pas.
+
+    Passe par `project_id_cache`, y compris pour les projets inexistants.
+    """
+    project_id = project_id_cache.get((developer_id, project_name))
+    if project_id is not MISSING:
+        return project_id
+    result = await db.execute(
+        select(Project.id).filter(
+            Project.name == project_name,
+            Project.developer_id == developer_id
+        )
+    )
+    project_id = result.scalars().first()
+    _cache_project_id(developer_id, project_name, project_id)
+    return project_id
+
+
+async def resolve_project_ids(db: AsyncSession, keys: set[tuple[int, str]]) -> dict[tuple[int, str], int | None]:
+    """
+    Résout un ensemble de couples (dev_id, nom du projet) en ids de projet.
+
+    Les couples absents du cache sont résolus en une seule requête, sur l'index (developer_id, name).
+    """
+    project_ids = {}
+    unknown_keys = set()
+    for key in keys:
+        project_id = project_id_cache.get(key)
+        if project_id is MISSING:
+            unknown_keys.add(key)
+        else:
+            project_ids[key] = project_id
+    if unknown_keys:
+        # Deux IN séparés plutôt qu'un IN sur le couple, que SQLite ne sait pas servir par un index :
+        # les couples en trop (développeur et nom présents, mais pas ensemble) sont ignorés ensuite.
+        result = await db.execute(
+            select(Project.id, Project.developer_id, Project.name).filter(
+                Project.developer_id.in_({developer_id for developer_id, _ in unknown_keys}),
+                Project.name.in_({name for _, name in unknown_keys}),
+            )
+        )
+        found = {(row.developer_id, row.name): row.id for row in result}
+        for key in unknown_keys:
+            project_ids[key] = found.get(key)
+            _cache_project_id(*key, found.get(key))
+    return project_ids
+
+
+async def get_projects_by_developer(db: AsyncSession, developer_id: int) -> list[ProjectResponse]:
     """
     Récupère tous les projets d'un développeur donné.
     """
     result = await db.execute(select(Project).filter(Project.developer_id == developer_id))
-    return result.scalars().all()
+    return [
+        ProjectResponse(id=project.id, name=project.name, dev_id=project.developer_id)
+        for project in result.scalars().all()
+    ]
+
+
+# ---- INGESTION ----
+
+def _after_commit(db: AsyncSession, callback: Callable[[], None]):
+    """
+    Exécute `callback` quand la transaction en cours de `db` est validée (rien en cas d'annulation).
+    """
+    db.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session):
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session):
+    session.info.pop("after_commit", None)
+
+
+async def _on_ingest(db: AsyncSession, kind: str,
+                     items: list[tuple[schemas.ThankYouClickCreate, int]] | list[tuple[schemas.MessageCreate, int]]):
+    """
+    Mises à jour annexes faites dans la transaction de chaque insertion de clics ou de messages.
+    `items` contient les éléments insérés avec l'id de leur projet :
+    - notifications instantanées mises dans l'outbox ;
+    - date de dernière activité des développeurs, pour que le cron des résumés ignore les inactifs ;
+    - compteurs des projets (`project_stats`) et compteurs par heure / par jour (`project_rollups`) ;
+    - sketches des soutiens : distincts (HyperLogLog, au total et par jour) et meilleurs soutiens (Space-Saving) ;
+    - versions du tableau de bord et événements temps réel, une fois la transaction validée.
+    """
+    await enqueue_notifications(db, kind, [item for item, _ in items])
+    developer_ids = {item.dev_id for item, _ in items}
+    project_ids = {project_id for _, project_id in items}
+    _after_commit(db, lambda: versions.bump(developer_ids, project_ids))
+    events = [_activity_event(kind, item, project_id) for item, project_id in items
+              if event_broker.has_subscribers(item.dev_id)]
+    if events:
+        _after_commit(db, lambda: event_broker.publish_many(events))
+    await db.execute(
+        update(Developer)
+        .filter(Developer.id.in_(developer_ids))
+        .values(last_activity_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    now = _utcnow()
+    increments = _increments_by_project(kind, items)
+    await _increment_project_stats(db, increments)
+    await _increment_rollups(db, increments, now)
+    await _update_supporter_sketches(db, kind, items, now)
+
+
+def _activity_event(kind: str, item, project_id: int) -> tuple[int, str, dict]:
+    """
+    Événement temps réel (développeur, type, données) d'un clic ou d'un message reçu.
+    """
+    data = {"projectId": project_id, "projectName": item.project_name, "userId": item.user_id,
+            "timestamp": _utcnow().isoformat()}
+    if kind == "thank_you":
+        data["clicks"] = item.count
+    else:
+        data["message"] = item.content
+    return item.dev_id, kind, data
+
+
+def _increments_by_project(kind: str, items) -> dict[int, dict[str, int]]:
+    """
+    Agrège les éléments insérés en incréments de compteurs par projet.
+    """
+    increments: dict[int, dict[str, int]] = {}
+    for item, project_id in items:
+        project_increments = increments.setdefault(project_id, {"clicks": 0, "sessions": 0, "messages": 0})
+        if kind == "thank_you":
+            project_increments["clicks"] += item.count
+            project_increments["sessions"] += 1
+        else:
+            project_increments["messages"] += 1
+    return increments
+
+
+async def _increment_project_stats(db: AsyncSession, increments: dict[int, dict[str, int]]):
+    """
+    Incrémente les compteurs des projets touchés par une insertion.
+    Un projet sans ligne de compteurs (créé avant leur mise en place) est recalculé depuis les tables brutes.
+    """
+    missing_project_ids = []
+    for project_id, project_increments in increments.items():
+        result = await db.execute(
+            update(ProjectStats)
+            .filter(ProjectStats.project_id == project_id)
+            .values(
+                total_clicks=ProjectStats.total_clicks + project_increments["clicks"],
+                click_sessions=ProjectStats.click_sessions + project_increments["sessions"],
+                total_messages=ProjectStats.total_messages + project_increments["messages"],
+                last_activity_at=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            missing_project_ids.append(project_id)
+    if missing_project_ids:
+        await _insert_project_stats_from_raw(db, missing_project_ids)
+
+
+ROLLUP_GRANULARITIES = ("hour", "day")
+
+
+def rollup_bucket(timestamp: datetime.datetime, granularity: str) -> datetime.datetime:
+    """
+    Début de la tranche horaire ou journalière contenant `timestamp`.
+    """
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def _increment_rollups(db: AsyncSession, increments: dict[int, dict[str, int]], now: datetime.datetime):
+    """
+    Incrémente les compteurs de la tranche horaire et journalière de `now` des projets touchés.
+    """
+    for granularity in ROLLUP_GRANULARITIES:
+        bucket = rollup_bucket(now, granularity)
+        for project_id, project_increments in increments.items():
+            result = await db.execute(
+                update(ProjectRollup)
+                .filter(
+                    ProjectRollup.project_id == project_id,
+                    ProjectRollup.granularity == granularity,
+                    ProjectRollup.bucket == bucket,
+                )
+                .values(
+                    clicks=ProjectRollup.clicks + project_increments["clicks"],
+                    click_sessions=ProjectRollup.click_sessions + project_increments["sessions"],
+                    messages=ProjectRollup.messages + project_increments["messages"],
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                await db.execute(insert(ProjectRollup).values(
+                    project_id=project_id,
+                    granularity=granularity,
+                    bucket=bucket,
+                    clicks=project_increments["clicks"],
+                    click_sessions=project_increments["sessions"],
+                    messages=project_increments["messages"],
+                ))
+
+
+async def _update_supporter_sketches(db: AsyncSession, kind: str, items, now: datetime.datetime):
+    """
+    Met à jour les sketches des soutiens des projets touchés :
+    - HyperLogLog des user_id distincts, au total (`project_stats`) et pour le jour de `now` (`project_rollups`) ;
+    - Space-Saving des user_id ayant envoyé le plus de mercis (`project_stats.top_supporters`), pour les clics.
+    Un sketch HyperLogLog n'est réécrit que si l'un de ses registres change, ce qui devient rare
+    une fois les soutiens habituels d'un projet déjà comptés.
+    Les sketches totaux absents (projet antérieur aux sketches) sont recalculés depuis les tables brutes.
+    """
+    user_ids: dict[int, set[str]] = {}
+    for item, project_id in items:
+        user_ids.setdefault(project_id, set()).add(item.user_id)
+
+    result = await db.execute(
+        select(ProjectStats.project_id, ProjectStats.supporters, ProjectStats.top_supporters)
+        .filter(ProjectStats.project_id.in_(user_ids))
+    )
+    stats_rows = result.all()
+    missing_project_ids = [row.project_id for row in stats_rows if row.supporters is None]
+    rebuilt = await _supporters_from_raw(db, missing_project_ids) if missing_project_ids else {}
+    missing_project_ids = [row.project_id for row in stats_rows if row.top_supporters is None]
+    rebuilt_top = await _top_supporters_from_raw(db, missing_project_ids) if missing_project_ids else {}
+    for row in stats_rows:
+        values = {}
+        if row.supporters is None:
+            values["supporters"] = rebuilt.get(row.project_id, HyperLogLog()).to_blob()
+        else:
+            sketch = HyperLogLog.from_blob(row.supporters)
+            if _add_all(sketch, user_ids[row.project_id]):
+                values["supporters"] = sketch.to_blob()
+        if row.top_supporters is None:
+            # Recalculé depuis les tables brutes, clics en cours compris
+            values["top_supporters"] = rebuilt_top.get(row.project_id, _new_top_supporters()).to_json()
+        elif kind == "thank_you":
+            top = SpaceSaving.from_json(settings.top_supporters_capacity, row.top_supporters)
+            for item, project_id in items:
+                if project_id == row.project_id:
+                    top.add(item.user_id, item.count)
+            values["top_supporters"] = top.to_json()
+        if values:
+            await db.execute(
+                update(ProjectStats).filter(ProjectStats.project_id == row.project_id)
+                .values(**values).execution_options(synchronize_session=False)
+            )
+
+    day = rollup_bucket(now, "day")
+    result = await db.execute(
+        select(ProjectRollup.project_id, ProjectRollup.supporters).filter(
+            ProjectRollup.project_id.in_(user_ids),
+            ProjectRollup.granularity == "day",
+            ProjectRollup.bucket == day,
+        )
+    )
+    for project_id, blob in result.all():
+        sketch = HyperLogLog.from_blob(blob)
+        if _add_all(sketch, user_ids[project_id]):
+            await db.execute(
+                update(ProjectRollup).filter(
+                    ProjectRollup.project_id == project_id,
+                    ProjectRollup.granularity == "day",
+                    ProjectRollup.bucket == day,
+                ).values(supporters=sketch.to_blob(), unique_supporters=sketch.count())
+                .execution_options(synchronize_session=False)
+            )
+
+
+def _add_all(sketch: HyperLogLog, values) -> bool:
+    """
+    Ajoute toutes les valeurs au sketch. Retourne True si au moins un registre a changé.
+    """
+    changed = False
+    for value in values:
+        changed = sketch.add(value) or changed
+    return changed
+
+
+def _click_history(project_ids: list[int] | None = None):
+    """
+    Historique complet des clics (tous les projets, ou seulement `project_ids`) : lignes de
+    `thank_you_clicks` et agrégats journaliers des clics compactés (`click_archive_days`).
+    Colonnes : project_id, user_id, clicks, click_sessions, timestamp (début du jour pour les agrégats).
+    """
+    raw = select(
+        ThankYouClick.project_id,
+        ThankYouClick.user_id,
+        ThankYouClick.count.label("clicks"),
+        literal(1).label("click_sessions"),
+        ThankYouClick.timestamp,
+    )
+    archived = select(
+        ClickArchiveDay.project_id,
+        ClickArchiveDay.user_id,
+        ClickArchiveDay.clicks,
+        ClickArchiveDay.click_sessions,
+        ClickArchiveDay.day,
+    )
+    if project_ids is not None:
+        raw = raw.filter(ThankYouClick.project_id.in_(project_ids))
+        archived = archived.filter(ClickArchiveDay.project_id.in_(project_ids))
+    return union_all(raw, archived).subquery()
+
+
+def _new_top_supporters() -> SpaceSaving:
+    return SpaceSaving(settings.top_supporters_capacity)
+
+
+async def _top_supporters_from_raw(db: AsyncSession, project_ids: list[int] | None = None) -> dict[int, SpaceSaving]:
+    """
+    Construit le résumé Space-Saving de chaque projet (tous, ou seulement `project_ids`) à partir
+    des totaux exacts par user_id : les `top_supporters_capacity` premiers sont repris sans erreur.
+    """
+    history = _click_history(project_ids)
+    stmt = select(
+        history.c.project_id, history.c.user_id, func.sum(history.c.clicks).label("clicks")
+    ).group_by(history.c.project_id, history.c.user_id)
+    totals: dict[int, list[tuple[int, str]]] = {}
+    result = await db.stream(stmt.execution_options(yield_per=SUMMARY_STREAM_CHUNK_SIZE))
+    async for project_id, user_id, clicks in result:
+        totals.setdefault(project_id, []).append((clicks, user_id))
+    tops = {}
+    for project_id, user_totals in totals.items():
+        top = _new_top_supporters()
+        top.total = sum(clicks for clicks, _ in user_totals)
+        for clicks, user_id in heapq.nlargest(settings.top_supporters_capacity, user_totals):
+            top.counters[user_id] = [clicks, 0]
+        tops[project_id] = top
+    return tops
+
+
+async def _supporters_from_raw(db: AsyncSession, project_ids: list[int] | None = None) -> dict[int, HyperLogLog]:
+    """
+    Construit les sketches des soutiens distincts (user_id des clics et des messages) de chaque projet
+    (tous, ou seulement `project_ids`) en lisant les tables brutes en streaming.
+    """
+    history = _click_history(project_ids)
+    clicks = select(history.c.project_id, history.c.user_id)
+    messages = select(Message.project_id, Message.user_id)
+    if project_ids is not None:
+        messages = messages.filter(Message.project_id.in_(project_ids))
+    sketches: dict[int, HyperLogLog] = {}
+    result = await db.stream(union_all(clicks, messages).execution_options(yield_per=SUMMARY_STREAM_CHUNK_SIZE))
+    async for project_id, user_id in result:
+        if project_id not in sketches:
+            sketches[project_id] = HyperLogLog()
+        sketches[project_id].add(user_id)
+    return sketches
 
 
 # ---- THANK YOU CLICKS ----
@@ -117,40 +543,199 @@ async def create_thank_you_click(db: AsyncSession, click: schemas.ThankYouClickC
     """
     Enregistre un clic "merci" pour un projet donné.
     """
-    project = await get_project_by_name_and_developer(db, click.project_name, click.dev_id)
-    if not project:
+    project_id = await resolve_project_id(db, click.project_name, click.dev_id)
+    if project_id is None:
         raise NoResultFound(f"Le projet '{click.project_name}' est introuvable.")
     thank_you_click = ThankYouClick(
         count=click.count,
         user_id=click.user_id,
-        project_id=project.id,
+        project_id=project_id,
     )
     db.add(thank_you_click)
+    await db.flush()
+    await _on_ingest(db, "thank_you", [(click, project_id)])
     await db.commit()
     await db.refresh(thank_you_click)
     return thank_you_click
 
 
+async def create_thank_you_clicks_batch(db: AsyncSession, clicks: list[schemas.ThankYouClickCreate]) -> list[int | None]:
+    """
+    Enregistre un lot de clics "merci" en une seule transaction.
+
+    Les projets sont résolus en une requête et les lignes insérées avec un seul executemany.
+    Retourne, pour chaque clic, l'id de son projet ou None si le projet est introuvable
+    (le clic est alors ignoré).
+    """
+    project_ids = await resolve_project_ids(db, {(click.dev_id, click.project_name) for click in clicks})
+    item_project_ids = [project_ids[(click.dev_id, click.project_name)] for click in clicks]
+    accepted = [(click, project_id) for click, project_id in zip(clicks, item_project_ids) if project_id is not None]
+    if accepted:
+        await db.execute(insert(ThankYouClick), [
+            {"count": click.count, "user_id": click.user_id, "project_id": project_id}
+            for click, project_id in accepted
+        ])
+        await _on_ingest(db, "thank_you", accepted)
+        await db.commit()
+    return item_project_ids
+
+
 # ---- MESSAGES ----
 
 async def create_message(db: AsyncSession, message: schemas.MessageCreate):
     """
     Enregistre un message pour un projet donné.
     """
-    project = await get_project_by_name_and_developer(db, message.project_name, message.dev_id)
-    if not project:
+    project_id = await resolve_project_id(db, message.project_name, message.dev_id)
+    if project_id is None:
         raise NoResultFound(f"Le projet '{message.project_name}' de {message.dev_id} est introuvable.")
     msg = Message(
         content=message.content,
         user_id=message.user_id,
-        project_id=project.id,
+        project_id=project_id,
     )
     db.add(msg)
+    await db.flush()
+    await _on_ingest(db, "message", [(message, project_id)])
     await db.commit()
     await db.refresh(msg)
     return msg
 
 
+async def create_messages_batch(db: AsyncSession, messages: list[schemas.MessageCreate]) -> list[int | None]:
+    """
+    Enregistre un lot de messages en une seule transaction.
+
+    Retourne, pour chaque message, l'id de son projet ou None si le projet est introuvable
+    (le message est alors ignoré).
+    """
+    project_ids = await resolve_project_ids(db, {(message.dev_id, message.project_name) for message in messages})
+    item_project_ids = [project_ids[(message.dev_id, message.project_name)] for message in messages]
+    accepted = [(message, project_id) for message, project_id in zip(messages, item_project_ids)
+                if project_id is not None]
+    if accepted:
+        await db.execute(insert(Message), [
+            {"content": message.content, "user_id": message.user_id, "project_id": project_id}
+            for message, project_id in accepted
+        ])
+        await _on_ingest(db, "message", accepted)
+        await db.commit()
+    return item_project_ids
+
+
+# ---- NOTIFICATIONS ----
+
+def _wants_notification(kind: str, dev: DeveloperDetailedResponse | None) -> bool:
+    """
+    Indique si le développeur veut une notification instantanée de ce type.
+    """
+    if dev is None:
+        return False
+    return dev.instant_messages if kind == "message" else dev.instant_thank_you
+
+
+async def enqueue_notifications(db: AsyncSession, kind: str,
+                                items: list[schemas.ThankYouClickCreate] | list[schemas.MessageCreate]):
+    """
+    Ajoute des notifications instantanées à l'outbox, dans la transaction en cours.
+
+    Les notifications sont envoyées plus tard par le worker de l'outbox.
+    Les mercis ne sont dus qu'à la fin de la fenêtre de regroupement, pour être envoyés
+    en un seul mail par développeur.
+    Seuls les développeurs qui ont activé ce type de notification en reçoivent : les préférences
+    sont lues dans `developer_cache`, et chargées en cas de miss.
+    """
+    devs = {developer_id: await get_developer_by_id(db, developer_id) for developer_id in {item.dev_id for item in items}}
+    next_attempt_at = _utcnow()
+    if kind == "thank_you":
+        next_attempt_at += timedelta(minutes=settings.instant_thank_you_window_minutes)
+    rows = [
+        {"kind": kind, "developer_id": item.dev_id, "payload": item.model_dump(), "next_attempt_at": next_attempt_at}
+        for item in items
+        if _wants_notification(kind, devs[item.dev_id])
+    ]
+    if rows:
+        await db.execute(insert(NotificationOutbox), rows)
+
+
+async def claim_notifications(db: AsyncSession, limit: int, lease_seconds: float) -> list[NotificationOutbox]:
+    """
+    Réserve jusqu'à `limit` notifications à envoyer pendant `lease_seconds` secondes.
+
+    La réservation est faite par des requêtes UPDATE pour que deux workers
+    ne puissent pas prendre la même ligne. Quand un merci d'un développeur est dû,
+    ses autres mercis en attente sont réservés avec lui pour partir dans le même mail,
+    au plus `limit` de plus (les plus anciens d'abord) : le reste part dans les lots suivants.
+    """
+    now = _utcnow()
+    lease_id = uuid.uuid4().hex
+    due_ids = (
+        select(NotificationOutbox.id)
+        .filter(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.next_attempt_at)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(NotificationOutbox)
+        .filter(NotificationOutbox.id.in_(due_ids), NotificationOutbox.next_attempt_at <= now)
+        .values(lease_id=lease_id, next_attempt_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    thank_you_developer_ids = (
+        select(NotificationOutbox.developer_id)
+        .filter(NotificationOutbox.lease_id == lease_id, NotificationOutbox.kind == "thank_you")
+        .scalar_subquery()
+    )
+    coalesced_ids = (
+        select(NotificationOutbox.id)
+        .filter(
+            NotificationOutbox.status == "pending",
+            NotificationOutbox.kind == "thank_you",
+            NotificationOutbox.lease_id.is_(None),
+            NotificationOutbox.developer_id.in_(thank_you_developer_ids),
+        )
+        .order_by(NotificationOutbox.next_attempt_at)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(NotificationOutbox)
+        .filter(NotificationOutbox.id.in_(coalesced_ids), NotificationOutbox.lease_id.is_(None))
+        .values(lease_id=lease_id, next_attempt_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    result = await db.execute(select(NotificationOutbox).filter(NotificationOutbox.lease_id == lease_id))
+    return result.scalars().all()
+
+
+async def complete_notifications(db: AsyncSession, done_ids: list[int],
+                                 failures: list[tuple[NotificationOutbox, str]],
+                                 max_attempts: int, retry_base_delay: float):
+    """
+    Clôt un lot de notifications en une transaction :
+    - supprime celles qui ont été traitées ;
+    - reprogramme celles en échec avec un délai exponentiel,
+      ou les passe en "dead" après `max_attempts` tentatives.
+    """
+    now = _utcnow()
+    for notification, error in failures:
+        attempts = notification.attempts + 1
+        values = {"attempts": attempts, "last_error": error[:2000], "lease_id": None}
+        if attempts >= max_attempts:
+            values["status"] = "dead"
+            logging.error(f"Notification {notification.id} abandonnée après {attempts} tentatives : {error}")
+        else:
+            values["next_attempt_at"] = now + timedelta(seconds=retry_base_delay * 2 ** (attempts - 1))
+        await db.execute(
+            update(NotificationOutbox).filter(NotificationOutbox.id == notification.id).values(**values)
+        )
+    if done_ids:
+        await db.execute(delete(NotificationOutbox).filter(NotificationOutbox.id.in_(done_ids)))
+    await db.commit()
+
+
 # ---- STATISTICS ----
 
 async def get_total_clicks_for_project(db: AsyncSession, project_id: int):
@@ -158,17 +743,119 @@ async def get_total_clicks_for_project(db: AsyncSession, project_id: int):
     Récupère le nombre total de clics pour un projet donné.
     """
     result = await db.execute(
-        select(ThankYouClick.count).filter(ThankYouClick.project_id == project_id)
+        select(ProjectStats.total_clicks).filter(ProjectStats.project_id == project_id)
     )
-    return sum(result.scalars().all())
+    return result.scalars().first() or 0
+
+
+async def get_project_stats(db: AsyncSession, project_id: int) -> ProjectStats | None:
+    """
+    Récupère les compteurs d'un projet donné.
+    """
+    result = await db.execute(select(ProjectStats).filter(ProjectStats.project_id == project_id))
+    return result.scalars().first()
 
 
-async def get_messages_for_project(db: AsyncSession, project_id: int):
+async def get_top_supporters(db: AsyncSession, project_id: int, limit: int) -> list[schemas.TopSupporter]:
+    """
+    Meilleurs soutiens d'un projet (user_id ayant envoyé le plus de mercis), lus dans son résumé Space-Saving.
     """
-    Récupère tous les messages pour un projet donné.
+    result = await db.execute(select(ProjectStats.top_supporters).filter(ProjectStats.project_id == project_id))
+    top = SpaceSaving.from_json(settings.top_supporters_capacity, result.scalar_one_or_none())
+    return [
+        schemas.TopSupporter(user_id=user_id, clicks=clicks, max_error=error)
+        for user_id, clicks, error in top.top(limit)
+    ]
+
+
+def _project_stats_from_raw_stmt(project_ids: list[int] | None = None):
+    """
+    Calcule les compteurs des projets (tous, ou seulement `project_ids`)
+    depuis les tables brutes `thank_you_clicks` (avec les clics compactés) et `messages`.
+    """
+    history = _click_history(project_ids)
+    clicks = select(
+        history.c.project_id,
+        func.sum(history.c.clicks).label("total_clicks"),
+        func.sum(history.c.click_sessions).label("click_sessions"),
+        func.max(history.c.timestamp).label("last_click"),
+    ).group_by(history.c.project_id)
+    messages = select(
+        Message.project_id,
+        func.count().label("total_messages"),
+        func.max(Message.timestamp).label("last_message"),
+    ).group_by(Message.project_id)
+    projects = select(Project.id)
+    if project_ids is not None:
+        messages = messages.filter(Message.project_id.in_(project_ids))
+        projects = projects.filter(Project.id.in_(project_ids))
+    clicks = clicks.subquery()
+    messages = messages.subquery()
+
+    return (
+        projects.add_columns(
+            func.coalesce(clicks.c.total_clicks, 0),
+            func.coalesce(messages.c.total_messages, 0),
+            func.coalesce(clicks.c.click_sessions, 0),
+            case(
+                (messages.c.last_message.is_(None), clicks.c.last_click),
+                (clicks.c.last_click.is_(None), messages.c.last_message),
+                (clicks.c.last_click > messages.c.last_message, clicks.c.last_click),
+                else_=messages.c.last_message,
+            ),
+        )
+        .outerjoin(clicks, clicks.c.project_id == Project.id)
+        .outerjoin(messages, messages.c.project_id == Project.id)
+    )
+
+
+async def _insert_project_stats_from_raw(db: AsyncSession, project_ids: list[int] | None = None):
+    await db.execute(
+        insert(ProjectStats).from_select(
+            ["project_id", "total_clicks", "total_messages", "click_sessions", "last_activity_at"],
+            _project_stats_from_raw_stmt(project_ids),
+        )
+    )
+
+
+async def rebuild_project_stats(db: AsyncSession) -> int:
+    """
+    Recalcule les compteurs de tous les projets depuis les tables brutes.
+    Retourne le nombre de projets recalculés.
+    """
+    await db.execute(delete(ProjectStats))
+    await _insert_project_stats_from_raw(db)
+    sketches = await _supporters_from_raw(db)
+    if sketches:
+        await db.execute(update(ProjectStats), [
+            {"project_id": project_id, "supporters": sketch.to_blob()} for project_id, sketch in sketches.items()
+        ])
+    await db.execute(
+        update(ProjectStats).filter(ProjectStats.supporters.is_(None)).values(supporters=HyperLogLog().to_blob())
+    )
+    tops = await _top_supporters_from_raw(db)
+    if tops:
+        await db.execute(update(ProjectStats), [
+            {"project_id": project_id, "top_supporters": top.to_json()} for project_id, top in tops.items()
+        ])
+    await db.execute(
+        update(ProjectStats).filter(ProjectStats.top_supporters.is_(None))
+        .values(top_supporters=_new_top_supporters().to_json())
+    )
+    await db.commit()
+    result = await db.execute(select(func.count()).select_from(ProjectStats))
+    return result.scalar_one()
+
+
+async def get_messages_for_project(db: AsyncSession, project_id: int, limit: int):
+    """
+    Récupère les `limit` derniers messages d'un projet donné.
+    La suite est disponible page par page avec `get_messages_page`.
     """
     result = await db.execute(
         select(Message.content).filter(Message.project_id == project_id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(limit)
     )
     return result.scalars().all()
 
@@ -201,6 +888,158 @@ async def get_last_message_for_project(db: AsyncSession, project_id: int):
     return None
 
 
+async def get_projects_summary(db: AsyncSession, developer_id: int) -> list[schemas.ProjectSummaryResponse]:
+    """
+    Récupère le résumé de tous les projets d'un développeur en une seule requête :
+    total de clics (lu dans `project_stats`) et dernier message de chaque projet.
+
+    Le dernier message est trouvé par une sous-requête corrélée (ORDER BY ... LIMIT 1) qui lit
+    une seule entrée de l'index (project_id, timestamp, id) par projet : le coût ne dépend pas
+    du nombre de messages reçus.
+    """
+    last_message_id = (
+        select(Message.id)
+        .filter(Message.project_id == Project.id)
+        .order_by(desc(Message.timestamp), desc(Message.id))
+        .limit(1)
+        .correlate(Project)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            Project.id,
+            Project.name,
+            Project.developer_id,
+            func.coalesce(ProjectStats.total_clicks, 0).label("total_clicks"),
+            Message.content,
+            Message.user_id,
+            Message.timestamp,
+        )
+        .outerjoin(ProjectStats, ProjectStats.project_id == Project.id)
+        .outerjoin(Message, Message.id == last_message_id)
+        .filter(Project.developer_id == developer_id)
+        .order_by(Project.id)
+    )
+    return [
+        schemas.ProjectSummaryResponse(
+            id=row.id,
+            name=row.name,
+            dev_id=row.developer_id,
+            total_clicks=row.total_clicks,
+            last_message=(
+                {"content": row.content, "user_id": row.user_id, "timestamp": row.timestamp}
+                if row.content is not None else None
+            ),
+        )
+        for row in result
+    ]
+
+
+async def get_project_timeseries(db: AsyncSession, project_id: int, granularity: str,
+                                 start: datetime.datetime, end: datetime.datetime) -> schemas.TimeseriesResponse:
+    """
+    Récupère les compteurs d'un projet par tranche (heure ou jour) entre `start` et `end`,
+    uniquement depuis `project_rollups`. Les tranches sans activité valent 0.
+    Les soutiens distincts sont lus par tranche journalière (estimation tenue à jour à l'insertion) et,
+    sur toute la période, estimés en fusionnant les sketches des jours couverts.
+    """
+    start = rollup_bucket(start, granularity)
+    result = await db.execute(
+        select(ProjectRollup).filter(
+            ProjectRollup.project_id == project_id,
+            ProjectRollup.granularity == granularity,
+            ProjectRollup.bucket >= start,
+            ProjectRollup.bucket <= end,
+        )
+    )
+    rollups = {rollup.bucket: rollup for rollup in result.scalars().all()}
+    if granularity == "day":
+        day_blobs = [rollup.supporters for rollup in rollups.values()]
+    else:
+        result = await db.execute(
+            select(ProjectRollup.supporters).filter(
+                ProjectRollup.project_id == project_id,
+                ProjectRollup.granularity == "day",
+                ProjectRollup.bucket >= rollup_bucket(start, "day"),
+                ProjectRollup.bucket <= end,
+            )
+        )
+        day_blobs = result.scalars().all()
+    period_supporters = HyperLogLog.union(day_blobs)
+
+    step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    points = []
+    bucket = start
+    while bucket <= end:
+        rollup = rollups.get(bucket)
+        points.append(schemas.TimeseriesPoint(
+            bucket=bucket,
+            clicks=rollup.clicks if rollup else 0,
+            click_sessions=rollup.click_sessions if rollup else 0,
+            messages=rollup.messages if rollup else 0,
+            unique_supporters=_estimate_supporters(rollup, granularity == "day"),
+        ))
+        bucket += step
+    return schemas.TimeseriesResponse(
+        id=project_id,
+        granularity=granularity,
+        unique_supporters=period_supporters.count(),
+        points=points,
+    )
+
+
+def _estimate_supporters(rollup: ProjectRollup | None, empty_is_zero: bool = True) -> int | None:
+    if rollup is None or rollup.supporters is None:
+        return 0 if empty_is_zero else None
+    if rollup.unique_supporters is None:
+        # Tranche antérieure à l'estimation stockée
+        return HyperLogLog.from_blob(rollup.supporters).count()
+    return rollup.unique_supporters
+
+
+async def rebuild_project_rollups(db: AsyncSession) -> int:
+    """
+    Recalcule toutes les tranches depuis les tables brutes et les clics compactés, lus en streaming.
+    Retourne le nombre de tranches écrites.
+    """
+    rollups: dict[tuple[int, str, datetime.datetime], dict[str, int]] = {}
+    sketches: dict[tuple[int, str, datetime.datetime], HyperLogLog] = {}
+    for kind, stmt in (
+        ("thank_you", select(ThankYouClick.project_id, ThankYouClick.user_id, ThankYouClick.count, ThankYouClick.timestamp)),
+        ("message", select(Message.project_id, Message.user_id, Message.timestamp)),
+    ):
+        result = await db.stream(stmt.execution_options(yield_per=SUMMARY_STREAM_CHUNK_SIZE))
+        async for row in result:
+            for granularity in ROLLUP_GRANULARITIES:
+                key = (row.project_id, granularity, rollup_bucket(row.timestamp, granularity))
+                rollup = rollups.setdefault(key, {"clicks": 0, "click_sessions": 0, "messages": 0})
+                if kind == "thank_you":
+                    rollup["clicks"] += row.count
+                    rollup["click_sessions"] += 1
+                else:
+                    rollup["messages"] += 1
+                if granularity == "day":
+                    sketches.setdefault(key, HyperLogLog()).add(row.user_id)
+    # Les clics compactés ne sont plus connus qu'à la journée : pas de tranches horaires pour ces jours-là
+    result = await db.stream(select(ClickArchiveDay).execution_options(yield_per=SUMMARY_STREAM_CHUNK_SIZE))
+    async for archived in result.scalars():
+        key = (archived.project_id, "day", archived.day)
+        rollup = rollups.setdefault(key, {"clicks": 0, "click_sessions": 0, "messages": 0})
+        rollup["clicks"] += archived.clicks
+        rollup["click_sessions"] += archived.click_sessions
+        sketches.setdefault(key, HyperLogLog()).add(archived.user_id)
+    await db.execute(delete(ProjectRollup))
+    if rollups:
+        await db.execute(insert(ProjectRollup), [
+            {"project_id": key[0], "granularity": key[1], "bucket": key[2], **counters,
+             "supporters": sketches[key].to_blob() if key in sketches else None,
+             "unique_supporters": sketches[key].count() if key in sketches else None}
+            for key, counters in rollups.items()
+        ])
+    await db.commit()
+    return len(rollups)
+
+
 async def get_recent_clicks_for_project(db: AsyncSession, project_id: int, limit: int = 10) -> list[ThankYouOut]:
     """
     Récupère les dernières sessions de clics pour un projet donné.
@@ -231,89 +1070,373 @@ async def get_recent_messages_for_project(db: AsyncSession, project_id: int, lim
     ]
 
 
-async def get_messages_not_yet_summarized_grouped_by_project(session: AsyncSession):
-    now = datetime.datetime.now(datetime.UTC)
-    daily_limit = now - timedelta(hours=23, minutes=31)
-    two_weeks_ago = now - timedelta(weeks=2)
-    weekly_limit = now - timedelta(days=6, hours=23, minutes=31)
+# ---- COMPACTION DES CLICS ----
+
+# Les résumés lisent les clics depuis le dernier envoi (au plus une semaine, plus les retards) :
+# on ne compacte jamais des clics plus récents que cela.
+CLICK_RETENTION_MIN_DAYS = 15
 
-    stmt = (
+
+async def get_clicks_before(db: AsyncSession, cutoff: datetime.datetime, limit: int):
+    """
+    Les `limit` plus anciennes lignes de `thank_you_clicks` antérieures à `cutoff`,
+    avec le timestamp tel qu'il est stocké.
+    """
+    result = await db.execute(
         select(
-            Developer.id.label("developer_id"),
-            Developer.username.label("developer_username"),
-            Developer.email.label("developer_email"),
-            Project.id.label("project_id"),
-            Project.name.label("project_name"),
-            Message.id.label("message_id"),
-            Message.user_id.label("message_user_id"),
-            Message.content.label("message_content"),
-            Message.timestamp.label("message_date")
+            ThankYouClick.id,
+            ThankYouClick.project_id,
+            ThankYouClick.user_id,
+            ThankYouClick.count,
+            type_coerce(ThankYouClick.timestamp, Text).label("timestamp"),
         )
-        .join(
-            Project,
-            and_(
-                Developer.id == Project.developer_id,
-                Developer.summary_frequency != "none"  # Exclure ceux avec "none"
+        .filter(ThankYouClick.timestamp < cutoff)
+        .order_by(ThankYouClick.timestamp, ThankYouClick.id)
+        .limit(limit)
+    )
+    return result.all()
+
+
+def _archive_day_totals(rows) -> dict[tuple[int, datetime.datetime, str], list[int]]:
+    """
+    Regroupe des clics bruts par (projet, jour, user_id) : [somme des count, nombre de lignes].
+    """
+    totals: dict[tuple[int, datetime.datetime, str], list[int]] = {}
+    for row in rows:
+        day = rollup_bucket(datetime.datetime.fromisoformat(str(row["timestamp"])), "day")
+        total = totals.setdefault((row["project_id"], day, row["user_id"]), [0, 0])
+        total[0] += row["count"]
+        total[1] += 1
+    return totals
+
+
+async def fold_clicks(db: AsyncSession, rows):
+    """
+    Ajoute des clics bruts aux agrégats journaliers de `click_archive_days` et les supprime
+    de `thank_you_clicks`, dans une seule transaction. Les totaux des projets ne changent pas.
+    """
+    for (project_id, day, user_id), (clicks, sessions) in _archive_day_totals(row._mapping for row in rows).items():
+        result = await db.execute(
+            update(ClickArchiveDay)
+            .filter(
+                ClickArchiveDay.project_id == project_id,
+                ClickArchiveDay.day == day,
+                ClickArchiveDay.user_id == user_id,
             )
+            .values(clicks=ClickArchiveDay.clicks + clicks, click_sessions=ClickArchiveDay.click_sessions + sessions)
+            .execution_options(synchronize_session=False)
         )
-        .join(
-            Message,
-            and_(
-                Project.id == Message.project_id,
-                Message.timestamp > two_weeks_ago  # Exclure les messages vieux de plus de deux semaines
+        if not result.rowcount:
+            await db.execute(insert(ClickArchiveDay).values(
+                project_id=project_id, day=day, user_id=user_id, clicks=clicks, click_sessions=sessions,
+            ))
+    await db.execute(
+        delete(ThankYouClick).filter(ThankYouClick.id.in_([row.id for row in rows]))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+def _same_click(click: ThankYouClick, row: dict) -> bool:
+    return (click.project_id, click.user_id, click.count, click.timestamp) == (
+        row["project_id"], row["user_id"], row["count"], datetime.datetime.fromisoformat(row["timestamp"]))
+
+
+async def restore_clicks(db: AsyncSession, rows: list[dict]) -> tuple[int, list[dict]]:
+    """
+    Réinsère des clics lus dans une archive (avec leur id d'origine) et les retire des agrégats journaliers.
+    Un clic déjà présent à l'identique est ignoré, donc restaurer deux fois la même archive est sans effet.
+    Un clic dont l'id est pris par un autre clic (ids réutilisés avant la migration 9) n'est pas restauré.
+    Retourne le nombre de clics réinsérés et les lignes d'archive en conflit.
+    """
+    rows = list({row["id"]: row for row in rows}.values())
+    result = await db.execute(select(ThankYouClick).filter(ThankYouClick.id.in_([row["id"] for row in rows])))
+    existing = {click.id: click for click in result.scalars().all()}
+    conflicts = [row for row in rows if row["id"] in existing and not _same_click(existing[row["id"]], row)]
+    rows = [row for row in rows if row["id"] not in existing]
+    if not rows:
+        return 0, conflicts
+    await db.execute(insert(ThankYouClick), [
+        {
+            "id": row["id"],
+            "project_id": row["project_id"],
+            "user_id": row["user_id"],
+            "count": row["count"],
+            "timestamp": datetime.datetime.fromisoformat(row["timestamp"]),
+        }
+        for row in rows
+    ])
+    for (project_id, day, user_id), (clicks, sessions) in _archive_day_totals(rows).items():
+        await db.execute(
+            update(ClickArchiveDay)
+            .filter(
+                ClickArchiveDay.project_id == project_id,
+                ClickArchiveDay.day == day,
+                ClickArchiveDay.user_id == user_id,
             )
+            .values(clicks=ClickArchiveDay.clicks - clicks, click_sessions=ClickArchiveDay.click_sessions - sessions)
+            .execution_options(synchronize_session=False)
         )
-        # .filter(
-        #     case(
-        #         (Developer.summary_frequency == "daily", Developer.last_summary_sent < daily_limit),
-        #         (Developer.summary_frequency == "weekly", Developer.last_summary_sent < weekly_limit),
-        #     )
-        # )
-        .filter(Message.timestamp > Developer.last_summary_sent)
-        .order_by(Developer.id, Project.id, desc(Message.timestamp))
-    )
-    result = await session.execute(stmt)
-    rows = result.fetchall()
-    grouped_data = {}
-    for row in rows:
-        dev_id = row.developer_id
-        project_id = row.project_id
-        if dev_id not in grouped_data:
-            grouped_data[dev_id] = {
-                "developer_username": row.developer_username,
-                "developer_email": row.developer_email,
-                "projects": {}
-            }
-        if project_id not in grouped_data[dev_id]["projects"]:
-            grouped_data[dev_id]["projects"][project_id] = {
-                "project_name": row.project_name,
-                "messages": []
-            }
-        grouped_data[dev_id]["projects"][project_id]["messages"].append({
-            "user_id": row.message_user_id,
-            "content": row.message_content,
-            "date": row.message_date
-        })
-    return grouped_data
-
-
-async def get_thank_you_clicks_not_yet_summarized_grouped_by_project(session: AsyncSession):
+    await db.execute(delete(ClickArchiveDay).filter(ClickArchiveDay.click_sessions <= 0))
+    await db.commit()
+    return len(rows), conflicts
+
+
+# ---- PAGINATION ----
+
+def _encode_cursor(timestamp: str, item_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp}|{item_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        timestamp, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        datetime.datetime.fromisoformat(timestamp)
+        return timestamp, int(item_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide.")
+
+
+async def _project_items_page(db: AsyncSession, model, project_id: int, limit: int, cursor: str | None):
+    """
+    Page d'éléments d'un projet, du plus récent au plus ancien, par pagination par clé (timestamp, id).
+
+    La page suivante repart du dernier élément lu au lieu de sauter un OFFSET,
+    donc une page lointaine coûte autant que la première sur l'index (project_id, timestamp, id).
+    """
+    # Le curseur garde le timestamp tel qu'il est stocké : SQLite compare des chaînes, et
+    # "2024-01-01 10:00:00" (func.now()) ne vaut pas "2024-01-01 10:00:00.000000" (datetime Python).
+    raw_timestamp = type_coerce(model.timestamp, Text)
+    stmt = select(model, raw_timestamp.label("raw_timestamp")).filter(model.project_id == project_id)
+    if cursor is not None:
+        stmt = stmt.filter(tuple_(raw_timestamp, model.id) < tuple_(*_decode_cursor(cursor)))
+    result = await db.execute(stmt.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1))
+    rows = result.all()
+    items = [row[0] for row in rows[:limit]]
+    if len(rows) <= limit:
+        return items, None
+    return items, _encode_cursor(rows[limit - 1].raw_timestamp, items[-1].id)
+
+
+async def get_messages_page(db: AsyncSession, project_id: int, limit: int, cursor: str | None = None) -> schemas.MessagePage:
+    """
+    Récupère une page de messages d'un projet. `cursor` est le `next_cursor` de la page précédente.
+    """
+    messages, next_cursor = await _project_items_page(db, Message, project_id, limit, cursor)
+    return schemas.MessagePage(
+        items=[MessageOut(content=message.content, user_id=message.user_id, timestamp=message.timestamp) for message in messages],
+        next_cursor=next_cursor,
+    )
+
+
+async def get_clicks_page(db: AsyncSession, project_id: int, limit: int, cursor: str | None = None) -> schemas.ThankYouPage:
+    """
+    Récupère une page de sessions de clics d'un projet. `cursor` est le `next_cursor` de la page précédente.
+    """
+    clicks, next_cursor = await _project_items_page(db, ThankYouClick, project_id, limit, cursor)
+    return schemas.ThankYouPage(
+        items=[ThankYouOut(count=click.count, user_id=click.user_id, timestamp=click.timestamp) for click in clicks],
+        next_cursor=next_cursor,
+    )
+
+
+# ---- RECHERCHE ----
+
+# Index plein texte des messages, créé par la migration 6 (voir migrations.py)
+messages_fts = table("messages_fts", column("rowid"), column("messages_fts"))
+SEARCH_SNIPPET_TOKENS = 16
+SEARCH_MAX_TERMS = 10
+
+
+def _fts_query(project_id: int, query: str) -> str | None:
+    """
+    Requête FTS5 : les termes saisis, chacun entre guillemets pour neutraliser la syntaxe FTS5,
+    le dernier en préfixe (recherche au fil de la frappe), restreints au jeton du projet.
+    """
+    terms = re.findall(r"\w+", query)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += " *"
+    return f'project:"p{project_id}" AND ' + " AND ".join(phrases)
+
+
+def _encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def _decode_offset(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide.")
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+async def search_messages(db: AsyncSession, project_id: int, query: str, limit: int,
+                          cursor: str | None = None) -> schemas.MessageSearchPage:
+    """
+    Messages d'un projet contenant tous les termes de `query`, du plus pertinent au moins pertinent (BM25).
+
+    La recherche passe par l'index FTS5 `messages_fts` : le coût dépend du nombre de messages
+    trouvés et non du nombre de messages du projet. Le classement évolue avec l'index,
+    la pagination se fait donc par décalage (`cursor` est le `next_cursor` de la page précédente).
+    """
+    match = _fts_query(project_id, query)
+    if match is None:
+        return schemas.MessageSearchPage(items=[], next_cursor=None)
+    offset = _decode_offset(cursor) if cursor is not None else 0
+    fts = literal_column("messages_fts")
+    result = await db.execute(
+        select(
+            Message.user_id, Message.content, Message.timestamp,
+            func.snippet(fts, 0, "\x02", "\x03", "…", SEARCH_SNIPPET_TOKENS).label("snippet"),
+        )
+        .select_from(messages_fts)
+        .join(Message, Message.id == messages_fts.c.rowid)
+        .filter(messages_fts.c.messages_fts.op("MATCH")(match))
+        # Seul le contenu compte dans le score : le jeton du projet est commun à tous les résultats
+        .order_by(func.bm25(fts, 1.0, 0.0), Message.id)
+        .offset(offset)
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    return schemas.MessageSearchPage(
+        items=[
+            schemas.MessageSearchHit(user_id=row.user_id, content=row.content, snippet=_highlight(row.snippet),
+                                     timestamp=row.timestamp)
+            for row in rows[:limit]
+        ],
+        next_cursor=_encode_offset(offset + limit) if len(rows) > limit else None,
+    )
+
+
+# ---- EXPORT ----
+
+# Nombre de lignes lues à la fois depuis le curseur d'export
+EXPORT_CHUNK_SIZE = 1000
+
+
+def encode_export_token(watermark: tuple[int, int]) -> str:
+    return base64.urlsafe_b64encode("|".join(map(str, watermark)).encode()).decode()
+
+
+def decode_export_token(token: str) -> tuple[int, int]:
+    try:
+        message_id, click_id = base64.urlsafe_b64decode(token.encode()).decode().split("|")
+        return int(message_id), int(click_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Paramètre since invalide.")
+
+
+# Compteurs des tables AUTOINCREMENT : plus grand id jamais attribué, même si la ligne a été supprimée
+sqlite_sequence = table("sqlite_sequence", column("name"), column("seq"))
+
+
+async def get_export_watermark(db: AsyncSession) -> tuple[int, int]:
+    """
+    Plus grands id de messages et de clics attribués : un export s'arrête là,
+    et l'export suivant repart de ce point avec `since`.
+    Pour les clics, c'est le compteur AUTOINCREMENT et non max(id) : la compaction peut vider la table,
+    et le curseur d'un client ne doit jamais repasser sous des ids qu'il a déjà vus.
+    """
+    message_id = (await db.execute(select(func.max(Message.id)))).scalar()
+    click_id = (await db.execute(
+        select(sqlite_sequence.c.seq).filter(sqlite_sequence.c.name == ThankYouClick.__tablename__)
+    )).scalar()
+    return message_id or 0, click_id or 0
+
+
+async def stream_project_export(db: AsyncSession, project_id: int,
+                                since: tuple[int, int], until: tuple[int, int]):
+    """
+    Produit par paquets de `EXPORT_CHUNK_SIZE` les messages puis les sessions de clics d'un projet
+    dont l'id est dans ]since, until], chacun dans l'ordre chronologique.
+
+    Les lignes sont lues en streaming sur l'index (project_id, timestamp, id) : la mémoire
+    utilisée ne dépend pas de la taille du projet. Les clics déjà compactés n'y sont plus,
+    ils sont dans les archives (python manage.py compact-clicks).
+    """
+    queries = [
+        select(
+            literal("message").label("type"), Message.id, Message.user_id,
+            null().label("count"), Message.content, Message.timestamp,
+        ).filter(Message.project_id == project_id, Message.id > since[0], Message.id <= until[0])
+        .order_by(Message.timestamp, Message.id),
+        select(
+            literal("thank_you").label("type"), ThankYouClick.id, ThankYouClick.user_id,
+            ThankYouClick.count, null().label("content"), ThankYouClick.timestamp,
+        ).filter(ThankYouClick.project_id == project_id, ThankYouClick.id > since[1], ThankYouClick.id <= until[1])
+        .order_by(ThankYouClick.timestamp, ThankYouClick.id),
+    ]
+    for stmt in queries:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        try:
+            async for rows in result.partitions():
+                yield rows
+        finally:
+            await result.close()
+
+
+# ---- SUMMARY MAILS ----
+
+# Nombre de lignes lues à la fois depuis le curseur des résumés
+SUMMARY_STREAM_CHUNK_SIZE = 500
+# Les éléments plus récents que cette marge sont laissés au résumé suivant,
+# pour ne pas rater ceux dont la transaction n'est pas encore validée.
+SUMMARY_CUTOFF_MARGIN = timedelta(seconds=10)
+
+
+def summary_cutoff() -> datetime.datetime:
+    """
+    Date limite des éléments inclus dans un envoi de résumés.
+    C'est aussi la valeur de `last_summary_sent` enregistrée après chaque envoi réussi.
+    """
+    return _utcnow() - SUMMARY_CUTOFF_MARGIN
+
+
+def _shard_filter(shard: tuple[int, int] | None) -> list:
+    """
+    Filtre sur les développeurs d'un shard (index, nombre de shards), ou aucun filtre si `shard` est None.
+    """
+    if shard is None:
+        return []
+    index, count = shard
+    return [Developer.id % count == index]
+
+
+def _not_yet_summarized_stmt(item_model, cutoff: datetime.datetime, shard: tuple[int, int] | None):
+    """
+    Sélectionne les messages ou les clics (`item_model`) à inclure dans les résumés, avec pour chacun
+    son rang dans son projet (du plus récent au plus ancien) et les totaux du projet.
+    """
     now = datetime.datetime.now(datetime.UTC)
     daily_limit = now - timedelta(hours=23, minutes=31)
     two_weeks_ago = now - timedelta(weeks=2)
     weekly_limit = now - timedelta(days=6, hours=23, minutes=31)
 
-    stmt = (
+    is_message = item_model is Message
+    return (
         select(
             Developer.id.label("developer_id"),
             Developer.username.label("developer_username"),
             Developer.email.label("developer_email"),
             Project.id.label("project_id"),
             Project.name.label("project_name"),
-            ThankYouClick.id.label("thank_you_id"),
-            ThankYouClick.user_id.label("thank_you_user_id"),
-            ThankYouClick.count.label("thank_you_count"),
-            ThankYouClick.timestamp.label("thank_you_date")
+            literal("message" if is_message else "thank_you").label("kind"),
+            item_model.user_id.label("user_id"),
+            (Message.content if is_message else cast(null(), Text)).label("content"),
+            (cast(null(), Integer) if is_message else ThankYouClick.count).label("count"),
+            item_model.timestamp.label("date"),
+            func.row_number().over(
+                partition_by=Project.id, order_by=(desc(item_model.timestamp), desc(item_model.id))
+            ).label("rank"),
+            func.count().over(partition_by=Project.id).label("total_items"),
+            (cast(null(), Integer) if is_message
+             else func.sum(ThankYouClick.count).over(partition_by=Project.id)).label("total_count"),
         )
         .join(
             Project,
@@ -323,84 +1446,120 @@ async def get_thank_you_clicks_not_yet_summarized_grouped_by_project(session: As
             )
         )
         .join(
-            ThankYouClick,
+            item_model,
             and_(
-                Project.id == ThankYouClick.project_id,
-                ThankYouClick.timestamp > two_weeks_ago  # Exclure les messages vieux de plus de deux semaines
+                Project.id == item_model.project_id,
+                item_model.timestamp > two_weeks_ago  # Exclure les éléments vieux de plus de deux semaines
             )
         )
-        # .filter(
-        #     case(
-        #         (Developer.summary_frequency == "daily", Developer.last_summary_sent < daily_limit),
-        #         (Developer.summary_frequency == "weekly", Developer.last_summary_sent < weekly_limit),
-        #     )
-        # )
-        .filter(ThankYouClick.timestamp > Developer.last_summary_sent)
-        .order_by(Developer.id, Project.id, desc(ThankYouClick.timestamp))
-    )
-    result = await session.execute(stmt)
-    rows = result.fetchall()
-
-    grouped_data = {}
-    for row in rows:
-        dev_id = row.developer_id
-        project_id = row.project_id
-        if dev_id not in grouped_data:
-            grouped_data[dev_id] = {
-                "developer_username": row.developer_username,
-                "developer_email": row.developer_email,
-                "projects": {}
-            }
-        if project_id not in grouped_data[dev_id]["projects"]:
-            grouped_data[dev_id]["projects"][project_id] = {
-                "project_name": row.project_name,
-                "thank_you_clicks": []
-            }
-        grouped_data[dev_id]["projects"][project_id]["thank_you_clicks"].append({
-            "user_id": row.thank_you_user_id,
-            "count": row.thank_you_count,
-            "date": row.thank_you_date
-        })
-    return grouped_data
-
-async def get_developer_summary_mails_to_send(db: AsyncSession):
-    messages_data = await get_messages_not_yet_summarized_grouped_by_project(db)
-    thank_you_data = await get_thank_you_clicks_not_yet_summarized_grouped_by_project(db)
-
-    # Étape 2 : Construire les DeveloperMailSummaryResponse
-    mails_to_send_data = []
-    for dev_id, dev_data in messages_data.items():
-        projects = []
-
-        for project_id, project_data in dev_data["projects"].items():
-            # Construire un résumé de projet avec messages et clics
-            recent_clicks = (
-                thank_you_data.get(dev_id, {}).get("projects", {}).get(project_id, {}).get("thank_you_clicks", [])
-            )
-            projects.append(ProjectMailSummary(
-                id=project_id,
-                name=project_data["project_name"],
-                recent_messages=[
-                    MessageOut(
-                        user_id=msg["user_id"],
-                        content=msg["content"],
-                        timestamp=msg["date"],
-                    )
-                    for msg in project_data["messages"]
-                ],
-                recent_clicks=[
-                    ThankYouOut(
-                        user_id=click["user_id"],
-                        count=click["count"],
-                        timestamp=click["date"],
-                    )
-                    for click in recent_clicks
-                ],
-            ))
+        .filter(
+            case(
+                (Developer.summary_frequency == "daily", Developer.last_summary_sent < daily_limit),
+                (Developer.summary_frequency == "weekly", Developer.last_summary_sent < weekly_limit),
+            ),
+            Developer.last_activity_at > Developer.last_summary_sent,  # Ignorer les développeurs sans activité
+            item_model.timestamp > Developer.last_summary_sent,
+            item_model.timestamp <= cutoff,
+            *_shard_filter(shard),
+        )
+    )
 
-        mails_to_send_data.append(DeveloperMailSummaryResponse(
-            username=dev_data["developer_username"],
-            email=dev_data["developer_email"],
-            projects=projects
-        ))
-    return mails_to_send_data
+
+def _summary_items_stmt(cutoff: datetime.datetime, shard: tuple[int, int] | None, items_per_project: int):
+    """
+    Requête unique des résumés : messages et clics réunis par UNION ALL, limités aux
+    `items_per_project` plus récents de chaque type par projet, triés par développeur puis projet.
+    """
+    items = union_all(
+        _not_yet_summarized_stmt(Message, cutoff, shard),
+        _not_yet_summarized_stmt(ThankYouClick, cutoff, shard),
+    ).subquery()
+    return (
+        select(items)
+        .filter(items.c.rank <= items_per_project)
+        .order_by(items.c.developer_id, items.c.project_id, items.c.kind, items.c.rank)
+    )
+
+
+async def stream_developer_summary_mails(db: AsyncSession, cutoff: datetime.datetime,
+                                         shard: tuple[int, int] | None = None):
+    """
+    Produit les résumés à envoyer, un développeur à la fois, avec les éléments
+    reçus depuis son dernier résumé et jusqu'à `cutoff`.
+    Seuls les développeurs dont la fréquence de résumé est échue sont inclus,
+    et seulement ceux du `shard` (index, nombre de shards) s'il est donné.
+
+    Chaque projet contient au plus `summary_items_per_project` messages et sessions de clics,
+    plus les totaux. Les lignes sont lues en streaming : la mémoire utilisée est bornée
+    par le plus gros développeur, et non par le volume total de données.
+    """
+    result = await db.stream(
+        _summary_items_stmt(cutoff, shard, settings.summary_items_per_project)
+        .execution_options(yield_per=SUMMARY_STREAM_CHUNK_SIZE)
+    )
+    current = None
+    try:
+        async for row in result:
+            if current is None or current.id != row.developer_id:
+                if current is not None:
+                    yield current
+                current = DeveloperMailSummaryResponse(
+                    id=row.developer_id, username=row.developer_username, email=row.developer_email, projects=[]
+                )
+            if not current.projects or current.projects[-1].id != row.project_id:
+                current.projects.append(ProjectMailSummary(
+                    id=row.project_id, name=row.project_name, recent_messages=[], recent_clicks=[]
+                ))
+            project = current.projects[-1]
+            if row.kind == "message":
+                project.total_messages = row.total_items
+                project.recent_messages.append(MessageOut(
+                    user_id=row.user_id, content=row.content, timestamp=row.date
+                ))
+            else:
+                project.total_click_sessions = row.total_items
+                project.total_clicks = row.total_count
+                project.recent_clicks.append(ThankYouOut(
+                    user_id=row.user_id, count=row.count, timestamp=row.date
+                ))
+        if current is not None:
+            yield current
+    finally:
+        await result.close()
+
+
+async def checkpoint_summary(db: AsyncSession, developer_id: int, cutoff: datetime.datetime):
+    """
+    Enregistre qu'un résumé couvrant tout jusqu'à `cutoff` a bien été envoyé au développeur.
+    """
+    await db.execute(update(Developer).filter(Developer.id == developer_id).values(last_summary_sent=cutoff))
+    await db.commit()
+    invalidate_developer(developer_id)
+
+
+# ---- SCHEDULER LOCKS ----
+
+async def acquire_lock(db: AsyncSession, name: str, owner: str, expires_at: datetime.datetime) -> bool:
+    """
+    Prend le verrou `name` jusqu'à `expires_at` s'il est libre, expiré ou déjà détenu par `owner`.
+    Retourne True si le verrou a été obtenu.
+    """
+    result = await db.execute(
+        update(SchedulerLock)
+        .filter(
+            SchedulerLock.name == name,
+            (SchedulerLock.expires_at < _utcnow()) | (SchedulerLock.owner == owner),
+        )
+        .values(owner=owner, expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        await db.commit()
+        return True
+    db.add(SchedulerLock(name=name, owner=owner, expires_at=expires_at))
+    try:
+        await db.commit()
+        return True
+    except IntegrityError:
+        await db.rollback()
+        return False
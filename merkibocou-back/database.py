@@ -1,3 +1,4 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
@@ -6,6 +7,17 @@ from config import settings
 # Création du moteur async
 engine = create_async_engine(settings.db_url, echo=True)
 
+
+# Mode WAL : les lectures longues (résumés en streaming) ne bloquent plus les écritures
+def set_sqlite_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", set_sqlite_wal)
+
 # Session async
 AsyncSessionLocal = sessionmaker(
     autocommit=False,
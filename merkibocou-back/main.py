@@ -1,36 +1,91 @@
+import datetime
 import html
-import logging
-from typing import List, Annotated
+import math
+import time
+from typing import Any, Awaitable, Callable, List, Annotated, Literal
 
-from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks, Request
+from fastapi.responses import RedirectResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_jwt import JwtAccessBearer
+from fastapi_jwt.jwt_backends.abstract_backend import BackendException
+from pydantic import TypeAdapter
 
 import models.projects
 from config import settings
 
 from crud import crud
 from database import AsyncSessionLocal, engine, Base
-from schemas.schemas import DeveloperCreate, DeveloperDetailedResponse, DeveloperResponse, DeveloperUpdatePreference, ProjectSummaryResponse, \
+from migrations import run_migrations
+from schemas.schemas import DeveloperCreate, DeveloperResponse, DeveloperUpdatePreference, ProjectSummaryResponse, \
     ProjectResponse, ProjectDetailsResponse, MessageCreate, ProjectCreate, MessageOut, ThankYouClickCreate, ThankYouOut, \
-    DeveloperLogin
-from services.mailing import mail_message_to_dev, send_instant_thank_you_notification, send_summary_mail_to_all
+    DeveloperLogin, ThankYouClickBatch, MessageBatch, BatchResponse, BatchItemResult, ProjectStatsResponse, \
+    TimeseriesResponse, MessagePage, MessageSearchPage, ThankYouPage, TopSupportersResponse
+from services.click_buffer import click_buffer
+from services.outbox import outbox_worker
+from services.mail_transport import smtp_pool
+from services.scheduler import summary_scheduler
+from services.cache import TTLCache, MISSING
+from services.versions import versions
+from services.events import event_broker
+from services.hll import HyperLogLog
+from services.export import EXPORT_FORMATS, export_project
+from services.passwords import password_hasher, PasswordHasherBusy
+from services.rate_limit import rate_limiter
 
 app = FastAPI()
 
 auth = JwtAccessBearer(secret_key=settings.jwt_secret_key)
+# Jetons du flux d'événements : passés dans l'URL (`EventSource` n'envoie pas d'en-tête Authorization),
+# donc de courte durée et signés avec une autre clé pour ne pas être acceptés par les autres routes
+events_auth = JwtAccessBearer(
+    secret_key=f"{settings.jwt_secret_key}:events",
+    access_expires_delta=datetime.timedelta(seconds=settings.events_token_ttl_seconds),
+)
+
+# Cache (développeur, chemin, ETag) -> corps JSON des réponses du tableau de bord
+response_cache = TTLCache(max_size=settings.response_cache_size, ttl=settings.response_cache_ttl)
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
 
 
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    if settings.click_buffer_enabled:
+        click_buffer.start()
+    outbox_worker.start()
+    if settings.summary_scheduler_enabled:
+        summary_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    event_broker.close()
+    if settings.click_buffer_enabled:
+        await click_buffer.stop()
+    await outbox_worker.stop()
+    if settings.summary_scheduler_enabled:
+        await summary_scheduler.stop()
+    await smtp_pool.close()
+    password_hasher.close()
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    """
+    Trop de connexions ou d'inscriptions en cours : le client est invité à réessayer un peu plus tard.
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Serveur occupé, réessayez dans quelques instants."},
+        headers={"Retry-After": "1"},
+    )
 
 
 async def get_db():
@@ -70,6 +125,54 @@ async def get_current_dev(user=Depends(auth), db=Depends(get_db)):
     dev = await crud.get_developer_by_id(db, dev_id)
     return dev
 
+
+@app.patch("/developers/me/preferences")
+async def update_preferences(preferences: DeveloperUpdatePreference, user=Depends(auth), db=Depends(get_db)):
+    """
+    Route pour modifier les préférences de notification du développeur connecté.
+    """
+    dev_id = user['id']
+    return await crud.update_developer_preferences(db, dev_id, preferences)
+
+@app.post("/developers/me/events/token")
+async def developer_events_token(user=Depends(auth)):
+    """
+    Jeton de courte durée à passer en `token` à `/developers/me/events`, qui ne sert qu'à ouvrir le flux.
+    """
+    token = events_auth.create_access_token({"id": user["id"]})
+    return {"token": token, "expires_in": settings.events_token_ttl_seconds}
+
+
+async def events_user(token: str | None = None) -> dict:
+    """
+    Développeur d'un jeton obtenu par `/developers/me/events/token`.
+    """
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton du flux manquant.")
+    try:
+        return events_auth.jwt_backend.decode(token, events_auth.secret_key)["subject"]
+    except BackendException as error:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(error))
+
+
+@app.get("/developers/me/events")
+async def developer_events(user=Depends(events_user)):
+    """
+    Flux Server-Sent Events des nouveaux clics (`thank_you`) et messages (`message`) reçus sur les projets du développeur.
+    Un événement `resync` signale que des événements ont été perdus : recharger les données puis se reconnecter.
+    Authentification par le paramètre `token` (voir `/developers/me/events/token`), un jeton n'étant valable
+    que peu de temps : en cas d'erreur, en demander un nouveau avant de se reconnecter.
+    """
+    subscription = event_broker.subscribe(user["id"])
+    if subscription is None:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Trop de flux ouverts pour ce compte.")
+    return StreamingResponse(
+        event_broker.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/developers/login/")
 async def login_developer(developer: DeveloperLogin, db: AsyncSession = Depends(get_db)):
     """
@@ -106,69 +209,67 @@ async def create_project(
 
 
 @app.get("/projects/", response_model=list[ProjectResponse])
-async def list_projects(db: AsyncSession = Depends(get_db), user=Depends(auth)):
+async def list_projects(request: Request, db: AsyncSession = Depends(get_db), user=Depends(auth)):
     """
     Route pour lister tous les projets d'un développeur.
     """
     developer_id = user["id"]
-    return await crud.get_projects_by_developer(db, developer_id)
+    return await versioned_response(
+        request, developer_id, versions.developer(developer_id), list[ProjectResponse],
+        lambda: crud.get_projects_by_developer(db, developer_id),
+    )
 
 
-@app.get("/projects/{project_id}/stats/")
+@app.get("/projects/{project_id}/stats/", response_model=ProjectStatsResponse)
 async def project_stats(
     project_id: int,
     db: AsyncSession = Depends(get_db),
     user=Depends(auth)
-) -> ProjectSummaryResponse:
+) -> ProjectStatsResponse:
     """
     Route pour récupérer les statistiques d'un projet.
+    Seuls les derniers messages sont inclus, la suite est paginée par `/projects/{project_id}/messages`.
     """
     developer_id = user["id"]
     project: models.projects.Project = await crud.verify_project_ownership(db, project_id, developer_id)
 
-    total_clicks = await crud.get_total_clicks_for_project(db, project.id)
-    messages = await crud.get_messages_for_project(db, project.id)
+    stats = await crud.get_project_stats(db, project.id)
+    messages = await crud.get_messages_for_project(db, project.id, limit=settings.page_size_default)
 
-    return ProjectSummaryResponse(
-        project_name=project.name,
+    return ProjectStatsResponse(
+        id=project.id,
+        name=project.name,
         dev_id=project.developer_id,
-        total_clicks=total_clicks,
+        total_clicks=stats.total_clicks if stats else 0,
+        total_messages=stats.total_messages if stats else 0,
+        click_sessions=stats.click_sessions if stats else 0,
+        last_activity=stats.last_activity_at if stats else None,
+        unique_supporters=HyperLogLog.from_blob(stats.supporters).count() if stats and stats.supporters else None,
         messages=messages,
     )
 
 
 @app.get("/projects/summary/", response_model=List[ProjectSummaryResponse])
-async def project_summary(db: AsyncSession = Depends(get_db), user=Depends(auth)) -> List[ProjectSummaryResponse]:
+async def project_summary(request: Request, db: AsyncSession = Depends(get_db), user=Depends(auth)) -> Response:
     """
     Retourne le résumé de tous les projets d'un développeur :
     - Total de clics
     - Dernier message envoyé
     """
     developer_id = user["id"]
-    # Récupère tous les projets du développeur
-    projects = await crud.get_projects_by_developer(db, developer_id)
-
-    summaries: list[ProjectSummaryResponse] = []
-    for project in projects:
-        total_clicks = await crud.get_total_clicks_for_project(db, project.id)
-        last_message = await crud.get_last_message_for_project(db, project.id)
-        logging.warning(f"{total_clicks}, {last_message}")
-        summaries.append(ProjectSummaryResponse(
-            id=project.id,
-            name=project.name,
-            dev_id=project.developer_id,
-            total_clicks=total_clicks,
-            last_message=last_message
-        ))
-    return summaries
+    return await versioned_response(
+        request, developer_id, versions.developer(developer_id), List[ProjectSummaryResponse],
+        lambda: crud.get_projects_summary(db, developer_id),
+    )
 
 
 @app.get("/projects/{project_id}/details/", response_model=ProjectDetailsResponse)
 async def project_details(
     project_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     user=Depends(auth)
-):
+) -> Response:
     """
     Retourne les détails d'un projet :
     - 10 dernières sessions de clics (avec user_id et timestamp)
@@ -176,56 +277,321 @@ async def project_details(
     """
     developer_id = user["id"]
 
-    # Vérifie que le développeur est propriétaire du projet
-    project = await crud.verify_project_ownership(db, project_id, developer_id)
+    async def build() -> ProjectDetailsResponse:
+        # Vérifie que le développeur est propriétaire du projet
+        project = await crud.verify_project_ownership(db, project_id, developer_id)
 
-    # Récupère les 10 dernières sessions de clics
-    recent_clicks: list[ThankYouOut] = await crud.get_recent_clicks_for_project(db, project.id, limit=10)
+        # Récupère les 10 dernières sessions de clics
+        recent_clicks: list[ThankYouOut] = await crud.get_recent_clicks_for_project(db, project.id, limit=10)
 
-    # Récupère les 10 derniers messages
-    recent_messages = await crud.get_recent_messages_for_project(db, project.id, limit=10)
+        # Récupère les 10 derniers messages
+        recent_messages = await crud.get_recent_messages_for_project(db, project.id, limit=10)
 
-    return ProjectDetailsResponse(
-        id=project.id,
-        name=project.name,
-        dev_id=project.developer_id,
-        recent_clicks=recent_clicks,
-        recent_messages=recent_messages
+        return ProjectDetailsResponse(
+            id=project.id,
+            name=project.name,
+            dev_id=project.developer_id,
+            recent_clicks=recent_clicks,
+            recent_messages=recent_messages
+        )
+
+    return await versioned_response(request, developer_id, versions.project(project_id), ProjectDetailsResponse, build)
+
+
+async def versioned_response(request: Request, developer_id: int, version: str, response_type: Any,
+                             build: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    Réponse JSON avec un ETag dérivé de `version`, servie depuis `response_cache` tant que la version ne change pas.
+
+    Si le client envoie le même ETag dans `If-None-Match`, on répond 304 sans corps.
+    Le cache est indexé par développeur : une entrée n'existe que si `build` a réussi pour lui,
+    donc les contrôles d'accès faits dans `build` (propriétaire du projet) restent valables sur un hit.
+    Les versions sont propres au processus : l'ETag porte aussi la tranche de `response_cache_ttl`
+    en cours, pour qu'un worker qui n'a pas vu une écriture ne réponde pas 304 plus d'un TTL.
+    """
+    etag = f'"{version}-{int(time.time() // settings.response_cache_ttl)}"'
+    key = (developer_id, request.url.path, etag)
+    body = response_cache.get(key)
+    if body is MISSING:
+        adapter = TypeAdapter(response_type)
+        body = adapter.dump_json(adapter.validate_python(await build(), from_attributes=True), by_alias=True)
+        response_cache.set(key, body)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/projects/{project_id}/messages", response_model=MessagePage)
+async def project_messages(
+    project_id: int,
+    limit: Annotated[int, Query(ge=1, le=settings.page_size_max)] = settings.page_size_default,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth)
+) -> MessagePage:
+    """
+    Messages d'un projet, du plus récent au plus ancien.
+    Passer le `nextCursor` de la réponse en `cursor` pour obtenir la page suivante.
+    """
+    project = await crud.verify_project_ownership(db, project_id, user["id"])
+    return await crud.get_messages_page(db, project.id, limit, cursor)
+
+
+@app.get("/projects/{project_id}/messages/search", response_model=MessageSearchPage)
+async def project_messages_search(
+    project_id: int,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=settings.page_size_max)] = settings.page_size_default,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth)
+) -> MessageSearchPage:
+    """
+    Recherche plein texte dans les messages d'un projet, résultats les plus pertinents d'abord.
+    Tous les termes doivent apparaître (le dernier peut être un début de mot), sans tenir compte des accents.
+    """
+    project = await crud.verify_project_ownership(db, project_id, user["id"])
+    return await crud.search_messages(db, project.id, q, limit, cursor)
+
+
+@app.get("/projects/{project_id}/clicks", response_model=ThankYouPage)
+async def project_clicks(
+    project_id: int,
+    limit: Annotated[int, Query(ge=1, le=settings.page_size_max)] = settings.page_size_default,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth)
+) -> ThankYouPage:
+    """
+    Sessions de clics d'un projet, de la plus récente à la plus ancienne.
+    Passer le `nextCursor` de la réponse en `cursor` pour obtenir la page suivante.
+    """
+    project = await crud.verify_project_ownership(db, project_id, user["id"])
+    return await crud.get_clicks_page(db, project.id, limit, cursor)
+
+
+@app.get("/projects/{project_id}/export")
+async def project_export(
+    project_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    since: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth)
+) -> StreamingResponse:
+    """
+    Export complet des messages et sessions de clics d'un projet, envoyé en streaming.
+    L'en-tête `X-Export-Since` de la réponse, passé en `since` à l'export suivant,
+    limite celui-ci aux éléments reçus depuis.
+    """
+    project = await crud.verify_project_ownership(db, project_id, user["id"])
+    start = crud.decode_export_token(since) if since is not None else (0, 0)
+    until = await crud.get_export_watermark(db)
+    return StreamingResponse(
+        export_project(AsyncSessionLocal, project.id, format, start, until),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{project.name}.{format}"',
+            "X-Export-Since": crud.encode_export_token(until),
+        },
     )
 
 
+@app.get("/projects/{project_id}/top-supporters", response_model=TopSupportersResponse)
+async def project_top_supporters(
+    project_id: int,
+    limit: Annotated[int, Query(ge=1, le=settings.top_supporters_capacity)] = 10,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth)
+) -> TopSupportersResponse:
+    """
+    Classement des user_id ayant envoyé le plus de mercis au projet.
+    Les totaux sont des bornes hautes (résumé Space-Saving) : le vrai total est au moins `clicks - maxError`.
+    """
+    project = await crud.verify_project_ownership(db, project_id, user["id"])
+    return TopSupportersResponse(id=project.id, supporters=await crud.get_top_supporters(db, project.id, limit))
+
+
+TIMESERIES_DEFAULT_RANGE = {"hour": datetime.timedelta(hours=48), "day": datetime.timedelta(days=30)}
+TIMESERIES_MAX_POINTS = 2000
+
+
+@app.get("/projects/{project_id}/timeseries", response_model=TimeseriesResponse)
+async def project_timeseries(
+    project_id: int,
+    granularity: Literal["hour", "day"] = "hour",
+    start: Annotated[datetime.datetime | None, Query(alias="from")] = None,
+    end: Annotated[datetime.datetime | None, Query(alias="to")] = None,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth)
+) -> TimeseriesResponse:
+    """
+    Retourne les mercis, sessions de clics et messages d'un projet par heure ou par jour,
+    avec le nombre estimé de soutiens distincts par jour et sur la période.
+    Par défaut : les 48 dernières heures ou les 30 derniers jours. Les dates sont en UTC.
+    """
+    project = await crud.verify_project_ownership(db, project_id, user["id"])
+
+    # Les dates avec fuseau sont ramenées en UTC naïf, comme en base
+    if start is not None and start.tzinfo is not None:
+        start = start.astimezone(datetime.UTC).replace(tzinfo=None)
+    if end is not None and end.tzinfo is not None:
+        end = end.astimezone(datetime.UTC).replace(tzinfo=None)
+    end = end or datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    start = start or end - TIMESERIES_DEFAULT_RANGE[granularity]
+    if start > end:
+        raise HTTPException(status_code=400, detail="`from` doit être antérieur à `to`.")
+    step = datetime.timedelta(hours=1) if granularity == "hour" else datetime.timedelta(days=1)
+    if (end - start) / step >= TIMESERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Intervalle trop grand (au plus {TIMESERIES_MAX_POINTS} points).")
+
+    return await crud.get_project_timeseries(db, project.id, granularity, start, end)
+
+
 # THANK YOU
+# Limites de débit (requêtes par minute) de chaque route publique, par IP, par user_id d'un projet et par projet
+RATE_LIMITS = {
+    "thank_you": {
+        "ip": settings.rate_limit_thank_you_ip,
+        "user": settings.rate_limit_thank_you_user,
+        "project": settings.rate_limit_thank_you_project,
+    },
+    "message": {
+        "ip": settings.rate_limit_message_ip,
+        "user": settings.rate_limit_message_user,
+        "project": settings.rate_limit_message_project,
+    },
+}
+RATE_LIMITED_ERROR = "Trop de requêtes, réessayez plus tard."
+
+
+def client_ip(request: Request) -> str | None:
+    """
+    Adresse du client : celle que le reverse proxy de confiance met dans `rate_limit_ip_header`
+    (la dernière de la liste, ajoutée par ce proxy ; les précédentes viennent du client),
+    sinon celle de la connexion.
+    """
+    if settings.rate_limit_ip_header:
+        forwarded = request.headers.get(settings.rate_limit_ip_header)
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else None
+
+
+def client_limits(route: str, request: Request) -> list:
+    return [(("ip", route, client_ip(request)), RATE_LIMITS[route]["ip"])]
+
+
+def item_limits(route: str, item: ThankYouClickCreate | MessageCreate) -> list:
+    project = (item.dev_id, item.project_name)
+    return [
+        (("user", route, project, item.user_id), RATE_LIMITS[route]["user"]),
+        (("project", route, project), RATE_LIMITS[route]["project"]),
+    ]
+
+
+def enforce_rate_limit(limits: list):
+    """
+    Refuse la requête avec un 429 si l'une des limites est atteinte, avant tout accès à la base.
+    """
+    if not settings.rate_limit_enabled:
+        return
+    wait = rate_limiter.acquire(limits)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=RATE_LIMITED_ERROR,
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def rate_limited_items(route: str, items: list) -> list[bool]:
+    """
+    Pour un envoi par lot (déjà compté une fois pour l'IP), indique les éléments refusés
+    par la limite de leur user_id ou de leur projet.
+    """
+    if not settings.rate_limit_enabled:
+        return [False] * len(items)
+    return [rate_limiter.acquire(item_limits(route, item)) > 0 for item in items]
+
+
 @app.post("/thank-you/")
-async def thank_you(click: ThankYouClickCreate, bg_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def thank_you(click: ThankYouClickCreate, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Route pour enregistrer un clic sur un projet.
+
+    Si le tampon de clics est activé, le clic est seulement mis en attente
+    et la route répond 202 sans attendre l'écriture en base.
     """
+    enforce_rate_limit(client_limits("thank_you", request) + item_limits("thank_you", click))
+    if settings.click_buffer_enabled:
+        await click_buffer.add(click)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"queued": True})
     try:
-        click_out = await crud.create_thank_you_click(db=db, click=click)
-        bg_tasks.add_task(send_instant_thank_you_notification, db, click)
-        return click_out
+        return await crud.create_thank_you_click(db=db, click=click)
     except NoResultFound:
         raise HTTPException(status_code=404, detail=f"Le projet {click.project_name} n'existe pas.")
-    
+
+
+@app.post("/thank-you/batch", response_model=BatchResponse)
+async def thank_you_batch(clicks: ThankYouClickBatch, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Route pour enregistrer un lot de clics en une seule transaction.
+    Le lot compte pour une requête dans la limite de l'IP, chaque clic dans celles de son user_id et de son projet.
+    """
+    enforce_rate_limit(client_limits("thank_you", request))
+    limited = rate_limited_items("thank_you", clicks)
+    accepted = [click for click, is_limited in zip(clicks, limited) if not is_limited]
+    project_ids = iter(await crud.create_thank_you_clicks_batch(db, accepted) if accepted else [])
+    return batch_response([
+        RATE_LIMITED_ERROR if is_limited
+        else None if next(project_ids) is not None
+        else f"Le projet {click.project_name} n'existe pas."
+        for click, is_limited in zip(clicks, limited)
+    ])
+
 
 # MESSAGES
 @app.post("/send-message/")
-async def send_message(message: MessageCreate, bg_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def send_message(message: MessageCreate, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Route pour envoyer un message à un projet.
     """
+    enforce_rate_limit(client_limits("message", request) + item_limits("message", message))
     message.content = clean_html(message.content)  # clean < & > to &lt; etc, nl 2 br, and double space to "&nbsp; "
     try:
-        message_out = await crud.create_message(db=db, message=message)
+        return await crud.create_message(db=db, message=message)
     except NoResultFound:
         raise HTTPException(status_code=404, detail=f"Le projet {message.project_name} n'existe pas.")
-    bg_tasks.add_task(send_instant_message_notification, db, message)
-    return message_out
 
-async def send_instant_message_notification(db, message: MessageCreate):
-    dev: DeveloperDetailedResponse = await crud.get_developer_by_id(db, message.dev_id)
-    if (dev.instant_messages):
-        await mail_message_to_dev(message, dev)
+
+@app.post("/send-message/batch", response_model=BatchResponse)
+async def send_message_batch(messages: MessageBatch, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Route pour envoyer un lot de messages en une seule transaction.
+    Le lot compte pour une requête dans la limite de l'IP, chaque message dans celles de son user_id et de son projet.
+    """
+    enforce_rate_limit(client_limits("message", request))
+    limited = rate_limited_items("message", messages)
+    for message in messages:
+        message.content = clean_html(message.content)
+    accepted = [message for message, is_limited in zip(messages, limited) if not is_limited]
+    project_ids = iter(await crud.create_messages_batch(db, accepted) if accepted else [])
+    return batch_response([
+        RATE_LIMITED_ERROR if is_limited
+        else None if next(project_ids) is not None
+        else f"Le projet {message.project_name} n'existe pas."
+        for message, is_limited in zip(messages, limited)
+    ])
+
+
+def batch_response(errors: list[str | None]) -> BatchResponse:
+    """
+    Construit la réponse d'un envoi par lot à partir de l'erreur (ou None) de chaque élément.
+    """
+    results = [BatchItemResult(index=i, ok=error is None, error=error) for i, error in enumerate(errors)]
+    accepted = sum(result.ok for result in results)
+    return BatchResponse(accepted=accepted, rejected=len(results) - accepted, results=results)
 
 def clean_html(content: str) -> str:
     """
@@ -253,9 +619,24 @@ def clean_html(content: str) -> str:
 #### CRON OPERATION
 
 @app.get("/triggerwebcron")
-async def trigger_cron(secret: Annotated[str, Query()], background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def trigger_cron(secret: Annotated[str, Query()], background_tasks: BackgroundTasks):
     if secret != settings.cron_secret_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Hophophop c’est interdit ici pour toi")
     else:
-        background_tasks.add_task(send_summary_mail_to_all, db)
-    return True
\ No newline at end of file
+        # Par shards, sous les mêmes verrous que le planificateur intégré s'il est aussi activé
+        background_tasks.add_task(summary_scheduler.run_all)
+    return True
+
+@app.get("/metrics/cache")
+async def cache_metrics(secret: Annotated[str, Query()]):
+    """
+    Compteurs des caches en mémoire (protégé par la clé du cron).
+    """
+    if secret != settings.cron_secret_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Hophophop c’est interdit ici pour toi")
+    return {
+        "project_ids": crud.project_id_cache.stats(),
+        "developers": crud.developer_cache.stats(),
+        "responses": response_cache.stats(),
+        "rate_limits": rate_limiter.stats(),
+    }
@@ -0,0 +1,567 @@
+"""
+Commandes d'administration.
+
+Usage (depuis le dossier merkibocou-back) :
+    python manage.py rebuild-stats
+    python manage.py rebuild-rollups
+    python manage.py check-query-plans
+    python manage.py bench-logins [--logins N] [--clients N] [--seconds S]
+    python manage.py bench-mail [--messages N] [--pool-size N]
+    python manage.py compare-supporters [--project ID]
+    python manage.py check-top-supporters [--project ID] [--limit N]
+    python manage.py compact-clicks [--retention-days N]
+    python manage.py restore-clicks archives/thank_you_clicks-2024-01.ndjson.gz [...]
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import re
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from crud import crud
+from database import AsyncSessionLocal, Base, set_sqlite_wal
+from main import init_db
+from migrations import run_migrations
+from schemas import schemas
+from models.messages import Message
+from models.project_stats import ProjectStats
+from config import settings
+from services.archives import compact_clicks, restore_clicks
+from services.hll import HyperLogLog, HLL_STANDARD_ERROR
+from services.mail_transport import SMTPPool, build_html_message
+from services.passwords import PasswordHasherBusy
+
+
+async def rebuild_stats(args):
+    """
+    Recalcule la table `project_stats` depuis les tables brutes.
+    """
+    async with AsyncSessionLocal() as db:
+        count = await crud.rebuild_project_stats(db)
+    print(f"Compteurs recalculés pour {count} projets.")
+
+
+async def rebuild_rollups(args):
+    """
+    Recalcule la table `project_rollups` depuis les tables brutes.
+    """
+    async with AsyncSessionLocal() as db:
+        count = await crud.rebuild_project_rollups(db)
+    print(f"{count} tranches recalculées.")
+
+
+# Parcours complets de table acceptés : requêtes d'administration ou de fond qui lisent tout par nature.
+FULL_SCAN_ALLOWED = {
+    # Job de fond : filtre sur la fréquence et l'activité de chaque développeur, puis tous leurs projets
+    "stream_developer_summary_mails": {"developers", "projects"},
+}
+
+# Nombre max de requêtes SQL (de tout type) par appel
+MAX_STATEMENTS = {
+    "get_projects_summary": 1,
+    # Insertion, outbox, last_activity_at, compteurs, rollups heure et jour, sketches des soutiens,
+    # relecture de la ligne insérée
+    "create_thank_you_click (caches chauds)": 10,
+    "create_message (caches chauds)": 9,
+}
+
+# Requêtes dont le coût ne doit pas dépendre du volume de messages et de clics reçus : le nombre
+# d'instructions SQLite de chacune est mesuré avant et après l'ajout de VOLUME_CHECK_ROWS lignes.
+FLAT_QUERIES = {"get_projects_summary"}
+VOLUME_CHECK_ROWS = 5000
+
+
+async def _run_crud_queries(session_factory, record):
+    """
+    Appelle les requêtes crud du chemin des requêtes HTTP et des workers sur une base de démonstration.
+    `record(name)` indique la fonction en cours, pour attribuer les requêtes SQL exécutées.
+    """
+    async with session_factory() as db:
+        record("create_developer")
+        developer_id = (await crud.create_developer(db, schemas.DeveloperCreate(
+            username="dev_plans", password="motdepasse", email="dev@example.org"))).id
+        record("create_project")
+        project_id = (await crud.create_project(db, developer_id, schemas.ProjectCreate(name="projet"))).id
+        clicks = [schemas.ThankYouClickCreate(projectName="projet", devId=developer_id, userId=f"user{i}", clicks=i + 1)
+                  for i in range(20)]
+        messages = [schemas.MessageCreate(projectName="projet", devId=developer_id, userId=f"user{i}", message="merci")
+                    for i in range(20)]
+        crud.project_id_cache.clear()
+        crud.developer_cache.clear()
+
+        calls = [
+            ("authenticate_developer", crud.authenticate_developer(db, "dev_plans", "motdepasse")),
+            ("get_developer_by_id", crud.get_developer_by_id(db, developer_id)),
+            ("update_developer_preferences", crud.update_developer_preferences(
+                db, developer_id, schemas.DeveloperUpdatePreference(instant_thank_you=True))),
+            ("resolve_project_ids", crud.resolve_project_ids(db, {(developer_id, "projet"), (developer_id, "absent")})),
+            ("get_projects_by_developer", crud.get_projects_by_developer(db, developer_id)),
+            ("create_thank_you_click", crud.create_thank_you_click(db, clicks[0])),
+            ("create_thank_you_clicks_batch", crud.create_thank_you_clicks_batch(db, clicks)),
+            ("create_message", crud.create_message(db, messages[0])),
+            ("create_messages_batch", crud.create_messages_batch(db, messages)),
+            ("claim_notifications", crud.claim_notifications(db, 50, 300)),
+            ("complete_notifications", crud.complete_notifications(db, [1], [], 5, 30)),
+            ("get_project_stats", crud.get_project_stats(db, project_id)),
+            ("get_total_clicks_for_project", crud.get_total_clicks_for_project(db, project_id)),
+            ("get_messages_for_project", crud.get_messages_for_project(db, project_id, limit=20)),
+            ("verify_project_ownership", crud.verify_project_ownership(db, project_id, developer_id)),
+            ("get_last_message_for_project", crud.get_last_message_for_project(db, project_id)),
+            ("get_projects_summary", crud.get_projects_summary(db, developer_id)),
+            ("get_project_timeseries", crud.get_project_timeseries(
+                db, project_id, "hour", crud._utcnow() - datetime.timedelta(hours=4), crud._utcnow())),
+            ("get_recent_clicks_for_project", crud.get_recent_clicks_for_project(db, project_id)),
+            ("get_recent_messages_for_project", crud.get_recent_messages_for_project(db, project_id)),
+            ("checkpoint_summary", crud.checkpoint_summary(db, developer_id, crud.summary_cutoff())),
+            ("acquire_lock", crud.acquire_lock(db, "plans", "owner", crud._utcnow())),
+        ]
+        for name, call in calls:
+            record(name)
+            await call
+
+        # Chemin d'ingestion habituel : projet et développeur déjà en cache
+        record(None)
+        await crud.get_developer_by_id(db, developer_id)
+        record("create_thank_you_click (caches chauds)")
+        await crud.create_thank_you_click(db, clicks[1])
+        record("create_message (caches chauds)")
+        await crud.create_message(db, messages[1])
+
+        record("get_messages_page")
+        page = await crud.get_messages_page(db, project_id, limit=5)
+        await crud.get_messages_page(db, project_id, limit=5, cursor=page.next_cursor)
+        record("search_messages")
+        page = await crud.search_messages(db, project_id, "merci", limit=5)
+        await crud.search_messages(db, project_id, "merci", limit=5, cursor=page.next_cursor)
+        record("get_clicks_page")
+        page = await crud.get_clicks_page(db, project_id, limit=5)
+        await crud.get_clicks_page(db, project_id, limit=5, cursor=page.next_cursor)
+        record("get_clicks_before")
+        await crud.get_clicks_before(db, crud._utcnow() + datetime.timedelta(days=1), limit=5000)
+        record("stream_project_export")
+        watermark = await crud.get_export_watermark(db)
+        async for _ in crud.stream_project_export(db, project_id, (0, 0), watermark):
+            pass
+        async for _ in crud.stream_project_export(db, project_id, (1, 1), watermark):
+            pass
+        record("stream_developer_summary_mails")
+        async for _ in crud.stream_developer_summary_mails(db, crud._utcnow() + datetime.timedelta(days=1)):
+            pass
+
+
+async def _temporary_database(directory: str):
+    """
+    Base SQLite vide dans `directory`, créée puis migrée comme au démarrage (en mode WAL, comme la base principale).
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/manage.db")
+    event.listen(engine.sync_engine, "connect", set_sqlite_wal)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+    return engine, session_factory
+
+
+async def check_query_plans(args):
+    """
+    Vérifie avec EXPLAIN QUERY PLAN qu'aucune requête crud ne parcourt une table entière.
+
+    Les requêtes sont exécutées sur une base SQLite temporaire (schéma créé puis migré comme
+    au démarrage), puis le plan de chacune est relu. Retourne un code d'erreur si une table
+    est parcourue sans index (ligne "SCAN <table>"), hors exceptions de FULL_SCAN_ALLOWED,
+    si une fonction dépasse son nombre de requêtes MAX_STATEMENTS, ou si le coût d'une requête
+    de FLAT_QUERIES grandit avec le volume de données.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine, session_factory = await _temporary_database(directory)
+
+        current = {"name": None}
+        statements = []
+        counts = {}
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            if current["name"]:
+                counts[current["name"]] = counts.get(current["name"], 0) + 1
+            if current["name"] and re.match(r"\s*(SELECT|UPDATE|DELETE|INSERT .* SELECT|WITH)", statement, re.S | re.I):
+                statements.append((current["name"], statement, parameters[0] if executemany else parameters))
+
+        await _run_crud_queries(session_factory, lambda name: current.update(name=name))
+        current["name"] = None
+
+        failures = 0
+        tables = set(Base.metadata.tables)
+        async with engine.connect() as conn:
+            for name, statement, parameters in statements:
+                plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                for row in plan:
+                    detail = row[-1]
+                    match = re.match(r"SCAN (\w+)( AS \w+)?$", detail)
+                    if match and match.group(1) in tables and match.group(1) not in FULL_SCAN_ALLOWED.get(name, set()):
+                        failures += 1
+                        print(f"[{name}] {detail}\n    {' '.join(statement.split())}\n")
+        await engine.dispose()
+
+        budget_failures = 0
+        for name, limit in MAX_STATEMENTS.items():
+            if counts.get(name, 0) > limit:
+                budget_failures += 1
+                print(f"[{name}] {counts[name]} requêtes SQL, {limit} au plus.\n")
+
+        flat = [(name, statement, parameters) for name, statement, parameters in statements if name in FLAT_QUERIES]
+        db_path = f"{directory}/manage.db"
+        before = [_vm_steps(db_path, statement, parameters) for _, statement, parameters in flat]
+        _add_volume(db_path, VOLUME_CHECK_ROWS)
+        volume_failures = 0
+        for (name, statement, parameters), steps in zip(flat, before):
+            steps_after = _vm_steps(db_path, statement, parameters)
+            if steps_after > 2 * steps + 1000:
+                volume_failures += 1
+                print(f"[{name}] {steps} puis {steps_after} instructions SQLite après l'ajout de "
+                      f"{VOLUME_CHECK_ROWS} lignes\n    {' '.join(statement.split())}\n")
+
+    print(f"{len(statements)} requêtes vérifiées, {failures} parcours complets de table, "
+          f"{budget_failures} fonctions au-delà de leur nombre de requêtes, "
+          f"{volume_failures} requêtes dont le coût dépend du volume.")
+    if failures or budget_failures or volume_failures:
+        sys.exit(1)
+
+
+def _vm_steps(db_path: str, statement: str, parameters) -> int:
+    """
+    Nombre approximatif d'instructions de la machine virtuelle SQLite exécutées par une requête.
+    """
+    conn = sqlite3.connect(db_path)
+    steps = [0]
+
+    def count():
+        steps[0] += 1
+        return 0
+
+    conn.set_progress_handler(count, 100)
+    conn.execute(statement, parameters).fetchall()
+    conn.close()
+    return steps[0] * 100
+
+
+def _add_volume(db_path: str, rows: int):
+    """
+    Ajoute `rows` messages et `rows` clics au premier projet de la base de démonstration.
+    """
+    conn = sqlite3.connect(db_path)
+    project_id = conn.execute("SELECT min(id) FROM projects").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO messages (content, user_id, timestamp, project_id) VALUES ('merci', 'user_volume', CURRENT_TIMESTAMP, ?)",
+        [(project_id,)] * rows,
+    )
+    conn.executemany(
+        "INSERT INTO thank_you_clicks (count, user_id, timestamp, project_id) VALUES (1, 'user_volume', CURRENT_TIMESTAMP, ?)",
+        [(project_id,)] * rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+async def bench_logins(args):
+    """
+    Mesure la latence d'enregistrement des clics pendant des connexions en parallèle.
+
+    Sur une base temporaire, `--clients` clients enregistrent des clics pendant `--seconds` secondes,
+    d'abord seuls puis avec `--logins` connexions en boucle. Affiche les latences p50 / p99 / max
+    des clics et le nombre de connexions réussies et refusées (pool de hachage saturé).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine, session_factory = await _temporary_database(directory)
+        async with session_factory() as db:
+            developer_id = (await crud.create_developer(db, schemas.DeveloperCreate(
+                username="dev_bench", password="motdepasse", email="dev@example.org"))).id
+            await crud.create_project(db, developer_id, schemas.ProjectCreate(name="projet"))
+        click = schemas.ThankYouClickCreate(projectName="projet", devId=developer_id, userId="user_bench", clicks=1)
+
+        async def ingest(deadline: float, latencies: list[float]):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                async with session_factory() as db:
+                    await crud.create_thank_you_click(db, click)
+                latencies.append(time.perf_counter() - start)
+
+        async def login(deadline: float, counts: dict[str, int]):
+            while time.perf_counter() < deadline:
+                try:
+                    async with session_factory() as db:
+                        await crud.authenticate_developer(db, "dev_bench", "motdepasse")
+                    counts["ok"] += 1
+                except PasswordHasherBusy:
+                    counts["shed"] += 1
+                    await asyncio.sleep(0.05)
+
+        for logins in (0, args.logins):
+            latencies = []
+            counts = {"ok": 0, "shed": 0}
+            deadline = time.perf_counter() + args.seconds
+            await asyncio.gather(
+                *(ingest(deadline, latencies) for _ in range(args.clients)),
+                *(login(deadline, counts) for _ in range(logins)),
+            )
+            latencies.sort()
+            p50, p99 = (latencies[int(len(latencies) * q)] * 1000 for q in (0.5, 0.99))
+            print(f"{logins} connexions en parallèle : {len(latencies)} clics, "
+                  f"p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {latencies[-1] * 1000:.1f} ms ; "
+                  f"{counts['ok']} connexions réussies, {counts['shed']} refusées")
+        await engine.dispose()
+
+
+async def bench_mail(args):
+    """
+    Mesure l'envoi de mails par `SMTPPool` contre un serveur SMTP local (aiosmtpd).
+
+    `--messages` mails sont envoyés tous en même temps sur un pool de `--pool-size` connexions :
+    d'abord sans réutilisation (une session SMTP par mail), puis avec réutilisation, puis juste
+    après que le serveur a coupé toutes les connexions du pool.
+    Affiche le débit, les connexions ouvertes et le maximum de connexions simultanées.
+    Retourne un code d'erreur si un mail est perdu ou si le pool dépasse sa taille.
+    """
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.smtp import SMTP, AuthResult
+    except ImportError:
+        sys.exit("bench-mail nécessite aiosmtpd (pip install aiosmtpd).")
+
+    class Handler:
+        def __init__(self):
+            self.sessions: set[SMTP] = set()
+            self.opened = 0
+            self.max_open = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            return "250 OK"
+
+    handler = Handler()
+
+    class CountingSMTP(SMTP):
+        def connection_made(self, transport):
+            super().connection_made(transport)
+            handler.sessions.add(self)
+            handler.opened += 1
+            handler.max_open = max(handler.max_open, len(handler.sessions))
+
+        def connection_lost(self, error):
+            handler.sessions.discard(self)
+            super().connection_lost(error)
+
+    class CountingController(Controller):
+        def factory(self):
+            return CountingSMTP(self.handler, **self.SMTP_kwargs)
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    controller = CountingController(handler, hostname="127.0.0.1", port=port,
+                                    authenticator=lambda *_: AuthResult(success=True), auth_require_tls=False)
+    controller.start()
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+    # Le pool lit sa configuration dans `settings` : on le dirige vers le serveur local
+    settings.mail_server, settings.mail_port = "127.0.0.1", port
+    settings.mail_ssl_tls = settings.mail_starttls = False
+    message = build_html_message("Bench", "dev@example.org", "<p>Merci !</p>" * 50)
+    errors = []
+
+    async def measure(label: str, pool: SMTPPool):
+        opened = handler.opened
+        handler.max_open = len(handler.sessions)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(pool.send(message) for _ in range(args.messages)), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        failed = sum(isinstance(result, BaseException) for result in results)
+        sent = len(results) - failed
+        print(f"{label} : {sent} envoyés, {failed} en échec, {sent / elapsed:.0f} mails/s, "
+              f"{handler.opened - opened} connexions ouvertes, {handler.max_open} simultanées au plus")
+        if failed:
+            errors.append(f"{label} : {failed} mails en échec")
+        if handler.max_open > args.pool_size:
+            errors.append(f"{label} : {handler.max_open} connexions simultanées pour un pool de {args.pool_size}")
+
+    async def wait_closed():
+        while handler.sessions:
+            await asyncio.sleep(0.01)
+
+    try:
+        # Connexion de contrôle ouverte par aiosmtpd au démarrage
+        await wait_closed()
+        # idle_timeout=0 : une connexion rendue au pool n'est jamais réutilisée
+        pool = SMTPPool(size=args.pool_size, idle_timeout=0)
+        await measure("Sans réutilisation", pool)
+        await pool.close()
+        await wait_closed()
+
+        pool = SMTPPool(size=args.pool_size, idle_timeout=60)
+        await measure("Avec réutilisation", pool)
+        idle = len(handler.sessions)
+        controller.loop.call_soon_threadsafe(lambda: [session.transport.close() for session in list(handler.sessions)
+                                                      if session.transport is not None])
+        await wait_closed()
+        await measure(f"Après coupure des {idle} connexions par le serveur", pool)
+        await pool.close()
+    finally:
+        controller.stop()
+
+    for error in errors:
+        print(error)
+    if errors:
+        sys.exit(1)
+
+
+async def compare_supporters(args):
+    """
+    Compare, projet par projet, l'estimation HyperLogLog des soutiens distincts au
+    COUNT(DISTINCT user_id) exact sur les tables brutes (clics compactés compris), avec le temps de chaque méthode.
+    """
+    async with AsyncSessionLocal() as db:
+        stmt = select(ProjectStats.project_id, ProjectStats.supporters).order_by(ProjectStats.project_id)
+        if args.project is not None:
+            stmt = stmt.filter(ProjectStats.project_id == args.project)
+        rows = (await db.execute(stmt)).all()
+        print(f"Erreur type attendue : {HLL_STANDARD_ERROR:.2%}")
+        print(f"{'projet':>8} {'exact':>10} {'estimé':>10} {'écart':>8} {'exact (ms)':>11} {'sketch (ms)':>12}")
+        for project_id, blob in rows:
+            started = time.perf_counter()
+            history = crud._click_history([project_id])
+            user_ids = union_all(
+                select(history.c.user_id),
+                select(Message.user_id).filter(Message.project_id == project_id),
+            ).subquery()
+            exact = (await db.execute(select(func.count(func.distinct(user_ids.c.user_id))))).scalar_one()
+            exact_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            sketch_blob = (await db.execute(
+                select(ProjectStats.supporters).filter(ProjectStats.project_id == project_id)
+            )).scalar_one()
+            estimate = HyperLogLog.from_blob(sketch_blob).count() if sketch_blob is not None else None
+            sketch_ms = (time.perf_counter() - started) * 1000
+
+            if estimate is None:
+                print(f"{project_id:>8} {exact:>10} {'-':>10} {'-':>8} {exact_ms:>11.1f} {'-':>12}")
+                continue
+            error = (estimate - exact) / exact if exact else 0.0
+            print(f"{project_id:>8} {exact:>10} {estimate:>10} {error:>8.2%} {exact_ms:>11.1f} {sketch_ms:>12.1f}")
+
+
+async def check_top_supporters(args):
+    """
+    Compare, projet par projet, le classement des meilleurs soutiens servi par l'API
+    au classement exact calculé par un GROUP BY sur tout l'historique des clics.
+    """
+    async with AsyncSessionLocal() as db:
+        stmt = select(ProjectStats.project_id).order_by(ProjectStats.project_id)
+        if args.project is not None:
+            stmt = stmt.filter(ProjectStats.project_id == args.project)
+        project_ids = (await db.execute(stmt)).scalars().all()
+        for project_id in project_ids:
+            sketch = await crud.get_top_supporters(db, project_id, args.limit)
+            history = crud._click_history([project_id])
+            exact = (await db.execute(
+                select(history.c.user_id, func.sum(history.c.clicks).label("clicks"))
+                .group_by(history.c.user_id)
+                .order_by(func.sum(history.c.clicks).desc(), history.c.user_id)
+                .limit(args.limit)
+            )).all()
+            if not exact:
+                continue
+            # Totaux exacts des soutiens listés : à égalité avec le dernier du classement exact, ils y ont leur place
+            threshold = exact[-1].clicks
+            exact_clicks = dict((await db.execute(
+                select(history.c.user_id, func.sum(history.c.clicks))
+                .filter(history.c.user_id.in_([supporter.user_id for supporter in sketch]))
+                .group_by(history.c.user_id)
+            )).all())
+            found = sum(1 for supporter in sketch if exact_clicks.get(supporter.user_id, 0) >= threshold)
+            print(f"Projet {project_id} : {found}/{len(exact)} soutiens au niveau du classement exact")
+            for supporter in sketch:
+                print(f"    {supporter.user_id:<50} {supporter.clicks:>8} (±{supporter.max_error})"
+                      f" exact : {exact_clicks.get(supporter.user_id, 0)}")
+
+
+async def compact(args):
+    """
+    Regroupe par jour les clics plus anciens que la rétention et archive les lignes d'origine.
+    """
+    try:
+        count = await compact_clicks(AsyncSessionLocal, args.retention_days, settings.click_archive_dir)
+    except ValueError as error:
+        sys.exit(str(error))
+    print(f"{count} clics compactés dans {settings.click_archive_dir}.")
+
+
+async def restore(args):
+    """
+    Réinsère les clics d'archives produites par `compact-clicks`.
+    Retourne un code d'erreur si des clics n'ont pas pu être restaurés (id déjà pris par un autre clic).
+    """
+    count, conflicts = await restore_clicks(AsyncSessionLocal, args.archives)
+    print(f"{count} clics restaurés.")
+    if conflicts:
+        sys.exit(f"{conflicts} clics non restaurés : leur id est déjà pris par un autre clic (voir le journal).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commandes d'administration MerkitBocou.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("rebuild-stats", help="Recalcule les compteurs des projets.").set_defaults(func=rebuild_stats)
+    subparsers.add_parser("rebuild-rollups", help="Recalcule les compteurs par heure et par jour.").set_defaults(func=rebuild_rollups)
+    subparsers.add_parser(
+        "check-query-plans", help="Vérifie que les requêtes crud utilisent des index (base temporaire)."
+    ).set_defaults(func=check_query_plans)
+    compare_parser = subparsers.add_parser(
+        "compare-supporters", help="Compare l'estimation des soutiens distincts au comptage exact."
+    )
+    compare_parser.add_argument("--project", type=int, default=None, help="Id d'un seul projet à comparer.")
+    compare_parser.set_defaults(func=compare_supporters)
+    top_parser = subparsers.add_parser(
+        "check-top-supporters", help="Compare le classement des meilleurs soutiens au calcul exact."
+    )
+    top_parser.add_argument("--project", type=int, default=None, help="Id d'un seul projet à vérifier.")
+    top_parser.add_argument("--limit", type=int, default=10, help="Taille du classement.")
+    top_parser.set_defaults(func=check_top_supporters)
+    compact_parser = subparsers.add_parser("compact-clicks", help="Compacte et archive les anciens clics.")
+    compact_parser.add_argument("--retention-days", type=int, default=settings.click_retention_days,
+                                help="Âge (en jours) à partir duquel les clics sont compactés.")
+    compact_parser.set_defaults(func=compact)
+    bench_parser = subparsers.add_parser(
+        "bench-logins", help="Mesure la latence des clics pendant des connexions en parallèle (base temporaire)."
+    )
+    bench_parser.add_argument("--logins", type=int, default=20, help="Connexions simultanées.")
+    bench_parser.add_argument("--clients", type=int, default=4, help="Clients qui enregistrent des clics.")
+    bench_parser.add_argument("--seconds", type=float, default=5.0, help="Durée de chaque mesure.")
+    bench_parser.set_defaults(func=bench_logins)
+    mail_parser = subparsers.add_parser(
+        "bench-mail", help="Mesure l'envoi de mails par le pool SMTP contre un serveur local (aiosmtpd)."
+    )
+    mail_parser.add_argument("--messages", type=int, default=300, help="Mails envoyés par mesure.")
+    mail_parser.add_argument("--pool-size", type=int, default=settings.mail_pool_size, help="Connexions du pool.")
+    mail_parser.set_defaults(func=bench_mail)
+    restore_parser = subparsers.add_parser("restore-clicks", help="Réinsère des clics archivés.")
+    restore_parser.add_argument("archives", nargs="+", help="Fichiers d'archive (motifs glob acceptés).")
+    restore_parser.set_defaults(func=restore)
+
+    args = parser.parse_args()
+
+    async def run():
+        await init_db()
+        await args.func(args)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
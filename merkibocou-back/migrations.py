@@ -0,0 +1,228 @@
+"""
+Migrations versionnées du schéma.
+
+`Base.metadata.create_all` crée les tables manquantes mais ne modifie jamais une table existante
+(colonnes, index). Chaque migration ci-dessous est appliquée une seule fois, dans l'ordre, et
+son numéro est enregistré dans la table `schema_version`. Les migrations doivent rester
+idempotentes : sur une base neuve, `create_all` a déjà créé ce qu'elles ajoutent.
+"""
+import logging
+
+from sqlalchemy import Connection, inspect, text
+
+from config import settings
+from models.thank_you_clicks import ThankYouClick
+from services.archives import max_archived_click_id
+from services.hll import HyperLogLog
+
+
+def _add_developer_last_activity(conn: Connection):
+    """
+    Ajoute `developers.last_activity_at` et l'initialise avec la dernière activité connue.
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("developers")}
+    if "last_activity_at" in columns:
+        return
+    conn.execute(text("ALTER TABLE developers ADD COLUMN last_activity_at DATETIME"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_developers_last_activity_at ON developers (last_activity_at)"))
+    conn.execute(text("""
+        UPDATE developers SET last_activity_at = (
+            SELECT max(activity) FROM (
+                SELECT max(thank_you_clicks.timestamp) AS activity FROM thank_you_clicks
+                JOIN projects ON projects.id = thank_you_clicks.project_id
+                WHERE projects.developer_id = developers.id
+                UNION ALL
+                SELECT max(messages.timestamp) AS activity FROM messages
+                JOIN projects ON projects.id = messages.project_id
+                WHERE projects.developer_id = developers.id
+            )
+        )
+    """))
+
+
+def _add_composite_indexes(conn: Connection):
+    """
+    Index composites des requêtes fréquentes : éléments d'un projet triés par date,
+    projets d'un développeur. Les index à une colonne qu'ils remplacent sont supprimés.
+    """
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_project_id_timestamp "
+        "ON messages (project_id, timestamp DESC, id DESC)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_thank_you_clicks_project_id_timestamp "
+        "ON thank_you_clicks (project_id, timestamp DESC, id DESC)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_projects_developer_id_name ON projects (developer_id, name)"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_messages_project_id"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_projects_developer_id"))
+
+
+def _add_outbox_lease_index(conn: Connection):
+    """
+    Index sur `notification_outbox.lease_id`, utilisé pour relire un lot réservé.
+    """
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_notification_outbox_lease_id ON notification_outbox (lease_id)"))
+
+
+def _add_supporter_sketches(conn: Connection):
+    """
+    Colonnes des sketches HyperLogLog des soutiens distincts. Laissées à NULL sur les lignes existantes :
+    le sketch d'un projet est recalculé depuis les tables brutes à sa prochaine activité
+    (ou pour tous avec `python manage.py rebuild-stats` et `rebuild-rollups`).
+    """
+    for table in ("project_stats", "project_rollups"):
+        columns = {column["name"] for column in inspect(conn).get_columns(table)}
+        if "supporters" not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN supporters BLOB"))
+
+
+def _add_top_supporters(conn: Connection):
+    """
+    Colonne du résumé Space-Saving des meilleurs soutiens, recalculé comme les sketches
+    HyperLogLog quand il est absent.
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("project_stats")}
+    if "top_supporters" not in columns:
+        conn.execute(text("ALTER TABLE project_stats ADD COLUMN top_supporters JSON"))
+
+
+def _unescaped_content(column: str) -> str:
+    """
+    Expression SQL qui annule `clean_html` sur `column` : l'index plein texte porte sur le texte
+    tapé par l'utilisateur, et non sur les entités HTML (&lt;, &quot;, <br>...).
+    """
+    expression = column
+    for escaped, raw in (("<br>", " "), ("&nbsp;", " "), ("&lt;", "<"), ("&gt;", ">"),
+                         ("&quot;", '"'), ("&#x27;", "'"), ("&amp;", "&")):
+        quoted = raw.replace("'", "''")
+        expression = f"replace({expression}, '{escaped}', '{quoted}')"
+    return expression
+
+
+def _add_messages_fts(conn: Connection):
+    """
+    Index plein texte FTS5 des messages, à contenu externe : le texte n'est pas dupliqué,
+    l'index lit la vue `messages_search` (contenu déséchappé et jeton du projet) et est tenu
+    à jour par des triggers sur `messages`. Les messages existants sont indexés par `rebuild`.
+    """
+    conn.execute(text(f"""
+        CREATE VIEW IF NOT EXISTS messages_search AS
+        SELECT id, {_unescaped_content("content")} AS content, 'p' || project_id AS project FROM messages
+    """))
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+        "content, project, content='messages_search', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    new_row = f"new.id, {_unescaped_content('new.content')}, 'p' || new.project_id"
+    old_row = f"'delete', old.id, {_unescaped_content('old.content')}, 'p' || old.project_id"
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content, project) VALUES ({new_row});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content, project) VALUES ({old_row});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content, project_id ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content, project) VALUES ({old_row});
+            INSERT INTO messages_fts (rowid, content, project) VALUES ({new_row});
+        END
+    """))
+    conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
+
+
+def _add_click_timestamp_index(conn: Connection):
+    """
+    Index sur `thank_you_clicks.timestamp`, utilisé par la compaction pour trouver les clics les plus anciens.
+    """
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_thank_you_clicks_timestamp ON thank_you_clicks (timestamp)"))
+
+
+def _add_rollup_unique_supporters(conn: Connection):
+    """
+    Colonne de l'estimation des soutiens distincts par tranche, calculée ici pour les sketches existants :
+    la série temporelle la lit au lieu de recompter un sketch par point.
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("project_rollups")}
+    if "unique_supporters" not in columns:
+        conn.execute(text("ALTER TABLE project_rollups ADD COLUMN unique_supporters INTEGER"))
+    rows = conn.execute(text(
+        "SELECT project_id, granularity, bucket, supporters FROM project_rollups "
+        "WHERE supporters IS NOT NULL AND unique_supporters IS NULL"
+    )).all()
+    if rows:
+        conn.execute(
+            text("UPDATE project_rollups SET unique_supporters = :estimate "
+                 "WHERE project_id = :project_id AND granularity = :granularity AND bucket = :bucket"),
+            [{"project_id": row.project_id, "granularity": row.granularity, "bucket": row.bucket,
+              "estimate": HyperLogLog.from_blob(row.supporters).count()} for row in rows],
+        )
+
+
+def _add_click_autoincrement(conn: Connection):
+    """
+    Recrée `thank_you_clicks` avec AUTOINCREMENT. Sans lui, SQLite reprend les ids à partir du plus grand
+    id restant : une fois la table vidée par la compaction, les nouveaux clics recevaient les ids
+    de clics archivés (ignorés à la restauration) ou déjà exportés (sautés par l'export incrémental).
+    Le compteur repart au-dessus du plus grand id en base et dans les archives.
+    """
+    table_sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'thank_you_clicks'"
+    )).scalar()
+    if "AUTOINCREMENT" not in table_sql.upper():
+        index_names = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'thank_you_clicks' AND sql IS NOT NULL"
+        )).scalars().all()
+        conn.execute(text("ALTER TABLE thank_you_clicks RENAME TO thank_you_clicks_old"))
+        for name in index_names:
+            conn.execute(text(f"DROP INDEX {name}"))
+        ThankYouClick.__table__.create(conn)
+        conn.execute(text(
+            "INSERT INTO thank_you_clicks (id, count, user_id, timestamp, project_id) "
+            "SELECT id, count, user_id, timestamp, project_id FROM thank_you_clicks_old"
+        ))
+        conn.execute(text("DROP TABLE thank_you_clicks_old"))
+    high_water = max(conn.execute(text("SELECT coalesce(max(id), 0) FROM thank_you_clicks")).scalar(),
+                     max_archived_click_id(settings.click_archive_dir))
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'thank_you_clicks'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('thank_you_clicks', :seq)"), {"seq": high_water})
+
+
+# (version, description, fonction) dans l'ordre d'application. Ne jamais renuméroter.
+MIGRATIONS = [
+    (1, "developers.last_activity_at", _add_developer_last_activity),
+    (2, "index composites (project_id, timestamp) et (developer_id, name)", _add_composite_indexes),
+    (3, "index notification_outbox.lease_id", _add_outbox_lease_index),
+    (4, "sketches HyperLogLog des soutiens", _add_supporter_sketches),
+    (5, "résumé Space-Saving des meilleurs soutiens", _add_top_supporters),
+    (6, "index plein texte FTS5 des messages", _add_messages_fts),
+    (7, "index thank_you_clicks.timestamp", _add_click_timestamp_index),
+    (8, "estimation des soutiens distincts par tranche", _add_rollup_unique_supporters),
+    (9, "ids de thank_you_clicks jamais réutilisés (AUTOINCREMENT)", _add_click_autoincrement),
+]
+
+
+def run_migrations(conn: Connection):
+    """
+    Applique les migrations pas encore enregistrées dans `schema_version`.
+    À appeler avec `conn.run_sync`, après `create_all` et dans la même transaction.
+    """
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    current = conn.execute(text("SELECT max(version) FROM schema_version")).scalar() or 0
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"Migration {version} : {description}")
+        migration(conn)
+        conn.execute(
+            text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+            {"version": version, "description": description},
+        )
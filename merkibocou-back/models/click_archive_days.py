@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from database import Base
+
+
+class ClickArchiveDay(Base):
+    """
+    Clics compactés : lignes de `thank_you_clicks` plus anciennes que la rétention, regroupées
+    par projet, jour et user_id. Les lignes d'origine sont dans les archives NDJSON
+    (`python manage.py compact-clicks` / `restore-clicks`).
+    """
+    __tablename__ = "click_archive_days"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    day = Column(DateTime, primary_key=True)  # Début du jour (UTC)
+    user_id = Column(String(50), primary_key=True)
+    clicks = Column(Integer, nullable=False, default=0)  # Somme des `count`
+    click_sessions = Column(Integer, nullable=False, default=0)  # Nombre de lignes compactées
@@ -16,12 +16,13 @@ class Developer(Base):
     email = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     instant_messages = Column(Boolean, default=True)  # Messages envoyés immédiatement
-    instant_thank_you = Column(Boolean, default=False)  # Merci envoyés toutes les 5 min
+    instant_thank_you = Column(Boolean, default=False)  # Merci regroupés et envoyés toutes les 5 min (instant_thank_you_window_minutes)
     summary_frequency = Column(
         String(20),  # "daily", "weekly", "none"
         default="daily"
     )
     last_summary_sent = Column(DateTime, nullable=False, default=func.now(), index=True)  # Date du dernier résumé envoyé
+    last_activity_at = Column(DateTime, nullable=True, index=True)  # Date du dernier clic ou message reçu sur ses projets
 
     # Relations
     projects = relationship("Project", back_populates="developer")
\ No newline at end of file
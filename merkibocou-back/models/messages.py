@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import Index, Column, Integer, String, Text, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -16,7 +16,11 @@ class Message(Base):
         nullable=False
     )
     timestamp = Column(DateTime, server_default=func.now(), index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
 
     # Relations
     project = relationship("Project", back_populates="messages")
+
+
+# Pagination par (timestamp, id) des éléments d'un projet, du plus récent au plus ancien
+Index("ix_messages_project_id_timestamp", Message.project_id, Message.timestamp.desc(), Message.id.desc())
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index, func
+from database import Base
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # "message", "thank_you"
+    developer_id = Column(Integer, ForeignKey("developers.id"), nullable=False, index=True)
+    payload = Column(JSON, nullable=False)  # Données nécessaires pour construire le mail
+    status = Column(String(20), nullable=False, default="pending")  # "pending", "dead"
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now())
+    lease_id = Column(String(32), nullable=True, index=True)  # Identifiant du worker qui traite la ligne
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
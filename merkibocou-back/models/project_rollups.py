@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary
+from database import Base
+
+
+class ProjectRollup(Base):
+    """
+    Compteurs d'un projet par tranche d'une heure ou d'un jour, tenus à jour à chaque insertion.
+    Peuvent être recalculés depuis les tables brutes avec `python manage.py rebuild-rollups`.
+    """
+    __tablename__ = "project_rollups"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    granularity = Column(String(10), primary_key=True)  # "hour", "day"
+    bucket = Column(DateTime, primary_key=True)  # Début de la tranche (UTC)
+    clicks = Column(Integer, nullable=False, default=0)
+    click_sessions = Column(Integer, nullable=False, default=0)
+    messages = Column(Integer, nullable=False, default=0)
+    supporters = Column(LargeBinary, nullable=True)  # Sketch HyperLogLog des user_id distincts (tranches "day" seulement)
+    unique_supporters = Column(Integer, nullable=True)  # Estimation tirée de `supporters`, recalculée quand il change
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, LargeBinary, JSON
+from database import Base
+
+
+class ProjectStats(Base):
+    """
+    Compteurs d'un projet, tenus à jour à chaque insertion de clics ou de messages.
+    Peuvent être recalculés depuis les tables brutes avec `python manage.py rebuild-stats`.
+    """
+    __tablename__ = "project_stats"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    total_clicks = Column(Integer, nullable=False, default=0)
+    total_messages = Column(Integer, nullable=False, default=0)
+    click_sessions = Column(Integer, nullable=False, default=0)  # Nombre de lignes thank_you_clicks
+    last_activity_at = Column(DateTime, nullable=True)
+    supporters = Column(LargeBinary, nullable=True)  # Sketch HyperLogLog des user_id distincts (None : à recalculer)
+    top_supporters = Column(JSON, nullable=True)  # Résumé Space-Saving des user_id ayant le plus de mercis (None : à recalculer)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -13,7 +13,7 @@ class Project(Base):
         index=True,
         nullable=False
     )
-    developer_id = Column(Integer, ForeignKey("developers.id"), nullable=False, index=True)
+    developer_id = Column(Integer, ForeignKey("developers.id"), nullable=False)
 
     # Relations
     developer = relationship("Developer", back_populates="projects")
@@ -22,4 +22,5 @@ class Project(Base):
 
     __table_args__ = (
         UniqueConstraint('name', 'developer_id', name='unique_project_name_per_developer'),
+        Index("ix_projects_developer_id_name", "developer_id", "name"),
     )
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+
+class SchedulerLock(Base):
+    __tablename__ = "scheduler_locks"
+
+    name = Column(String(100), primary_key=True)  # Ex : "summary-shard-3"
+    owner = Column(String(32), nullable=False)  # Identifiant de l'instance qui détient le verrou
+    expires_at = Column(DateTime, nullable=False)
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Index, Column, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from database import Base
 
 
 class ThankYouClick(Base):
     __tablename__ = "thank_you_clicks"
+    # Ids jamais réutilisés, même quand la compaction vide la table : ils identifient aussi les clics archivés
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     count = Column(Integer, default=0, nullable=False)
@@ -18,4 +20,10 @@ class ThankYouClick(Base):
 
     # Relations
     project = relationship("Project", back_populates="thank_you_clicks")
-    
\ No newline at end of file
+    
+
+
+# Pagination par (timestamp, id) des éléments d'un projet, du plus récent au plus ancien
+Index("ix_thank_you_clicks_project_id_timestamp", ThankYouClick.project_id, ThankYouClick.timestamp.desc(), ThankYouClick.id.desc())
+# Compaction des clics les plus anciens (python manage.py compact-clicks)
+Index("ix_thank_you_clicks_timestamp", ThankYouClick.timestamp)
@@ -86,6 +86,36 @@ class MessageCreate(BaseModel):
         populate_by_name = True
 
 
+# ---- BATCHES ----
+
+BATCH_MAX_ITEMS = 500
+
+ThankYouClickBatch = Annotated[
+    List[ThankYouClickCreate],
+    Field(min_length=1, max_length=BATCH_MAX_ITEMS, description="Lot de clics (500 max).")
+]
+
+MessageBatch = Annotated[
+    List[MessageCreate],
+    Field(min_length=1, max_length=BATCH_MAX_ITEMS, description="Lot de messages (500 max).")
+]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """
+    Résultat d'un envoi par lot, élément par élément.
+    """
+    accepted: int
+    rejected: int
+    results: List[BatchItemResult]
+
+
 # ---- DEVELOPERS ----
 
 class DeveloperCreate(BaseModel):
@@ -175,6 +205,51 @@ class ProjectSummaryResponse(BaseModel):
     last_message: dict|None = Field(serialization_alias="lastMessage", default_factory=dict)  # Dictionnaire contenant le contenu, user_id et timestamp du dernier message
 
 
+class TopSupporter(BaseModel):
+    user_id: UserName = Field(serialization_alias="userId")
+    clicks: int  # Borne haute : le vrai total est entre clicks - max_error et clicks
+    max_error: int = Field(serialization_alias="maxError")
+
+
+class TopSupportersResponse(BaseModel):
+    id: int
+    supporters: List[TopSupporter]
+
+
+# Les soutiens distincts sont estimés par HyperLogLog : erreur type de 1.6 % (services/hll.py)
+UNIQUE_SUPPORTERS_DESCRIPTION = "Nombre estimé de user_id distincts (clics et messages), erreur type ~1.6 %."
+
+
+class ProjectStatsResponse(BaseModel):
+    id: int
+    name: str
+    dev_id: int
+    total_clicks: int = Field(serialization_alias="totalClicks")
+    total_messages: int = Field(serialization_alias="totalMessages")
+    click_sessions: int = Field(serialization_alias="clickSessions")
+    last_activity: Optional[datetime] = Field(serialization_alias="lastActivity", default=None)
+    unique_supporters: Optional[int] = Field(
+        None, serialization_alias="uniqueSupporters", description=UNIQUE_SUPPORTERS_DESCRIPTION)
+    messages: List[str] = Field(default_factory=list)  # Contenu des derniers messages du projet
+
+
+class TimeseriesPoint(BaseModel):
+    bucket: datetime  # Début de la tranche (UTC)
+    clicks: int
+    click_sessions: int = Field(serialization_alias="clickSessions")
+    messages: int
+    unique_supporters: Optional[int] = Field(  # None pour les tranches horaires
+        None, serialization_alias="uniqueSupporters", description=UNIQUE_SUPPORTERS_DESCRIPTION)
+
+
+class TimeseriesResponse(BaseModel):
+    id: int
+    granularity: Literal["hour", "day"]
+    unique_supporters: int = Field(  # Sur les jours couverts par la période
+        serialization_alias="uniqueSupporters", description=UNIQUE_SUPPORTERS_DESCRIPTION)
+    points: List[TimeseriesPoint]
+
+
 class MessageOut(BaseModel):
     user_id: UserName = Field(serialization_alias="userId")
     content: str = Field(serialization_alias="message")
@@ -187,6 +262,28 @@ class ThankYouOut(BaseModel):
     timestamp: datetime
 
 
+class MessagePage(BaseModel):
+    items: List[MessageOut]
+    next_cursor: Optional[str] = Field(None, serialization_alias="nextCursor")  # None : dernière page
+
+
+class ThankYouPage(BaseModel):
+    items: List[ThankYouOut]
+    next_cursor: Optional[str] = Field(None, serialization_alias="nextCursor")  # None : dernière page
+
+
+class MessageSearchHit(BaseModel):
+    user_id: UserName = Field(serialization_alias="userId")
+    content: str = Field(serialization_alias="message")
+    snippet: str  # Extrait échappé, termes trouvés entourés de <mark>
+    timestamp: datetime
+
+
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchHit]
+    next_cursor: Optional[str] = Field(None, serialization_alias="nextCursor")  # None : dernière page
+
+
 class ProjectDetailsResponse(BaseModel):
     id: int
     name: str
@@ -201,11 +298,15 @@ class ProjectDetailsResponse(BaseModel):
 class ProjectMailSummary(BaseModel):
     id: int
     name: str
-    recent_clicks: List[ThankYouOut]
-    recent_messages: List[MessageOut]
+    recent_clicks: List[ThankYouOut]  # Les N sessions de clics les plus récentes
+    recent_messages: List[MessageOut]  # Les N messages les plus récents
+    total_clicks: int = 0
+    total_click_sessions: int = 0
+    total_messages: int = 0
 
 
 class DeveloperMailSummaryResponse(BaseModel):
+    id: int
     username: str
     email: str
     projects: List[ProjectMailSummary]
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+import glob
+import gzip
+import json
+import logging
+import os
+
+from crud import crud
+
+
+def _archive_path(archive_dir: str, timestamp: str) -> str:
+    return os.path.join(archive_dir, f"thank_you_clicks-{timestamp[:7]}.ndjson.gz")
+
+
+def _append_to_archives(archive_dir: str, rows):
+    """
+    Ajoute les clics à l'archive de leur mois : un fichier NDJSON compressé en gzip par mois.
+    Chaque ajout est un nouveau membre gzip à la fin du fichier (les fichiers ne sont jamais réécrits),
+    écrit sur disque avant que les lignes ne soient supprimées de la base.
+    """
+    by_path: dict[str, list[str]] = {}
+    for row in rows:
+        line = json.dumps({
+            "id": row.id,
+            "project_id": row.project_id,
+            "user_id": row.user_id,
+            "count": row.count,
+            "timestamp": row.timestamp,
+        })
+        by_path.setdefault(_archive_path(archive_dir, row.timestamp), []).append(line)
+    for path, lines in by_path.items():
+        with open(path, "ab") as file:
+            with gzip.GzipFile(fileobj=file, mode="wb") as archive:
+                archive.write(("\n".join(lines) + "\n").encode())
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def _read_archive(path: str) -> list[dict]:
+    with gzip.open(path, "rt") as archive:
+        return [json.loads(line) for line in archive if line.strip()]
+
+
+def max_archived_click_id(archive_dir: str) -> int:
+    """
+    Plus grand id de clic présent dans les archives de `archive_dir` (0 s'il n'y en a pas).
+    """
+    return max((row["id"] for path in glob.glob(_archive_path(archive_dir, "*")) for row in _read_archive(path)),
+               default=0)
+
+
+async def compact_clicks(session_factory, retention_days: int, archive_dir: str, chunk_size: int = 5000) -> int:
+    """
+    Compacte les clics plus anciens que `retention_days` jours (arrondi au début du jour) :
+    par lots de `chunk_size`, les lignes sont ajoutées aux archives puis remplacées en base
+    par des agrégats journaliers. Retourne le nombre de lignes compactées.
+
+    Un arrêt entre l'écriture de l'archive et la validation en base laisse des lignes en double
+    dans l'archive ; la restauration les dédoublonne par id.
+    """
+    if retention_days < crud.CLICK_RETENTION_MIN_DAYS:
+        raise ValueError(f"La rétention des clics doit être d'au moins {crud.CLICK_RETENTION_MIN_DAYS} jours.")
+    cutoff = crud.rollup_bucket(crud._utcnow() - datetime.timedelta(days=retention_days), "day")
+    os.makedirs(archive_dir, exist_ok=True)
+    compacted = 0
+    while True:
+        async with session_factory() as db:
+            rows = await crud.get_clicks_before(db, cutoff, chunk_size)
+            if not rows:
+                break
+            await asyncio.to_thread(_append_to_archives, archive_dir, rows)
+            await crud.fold_clicks(db, rows)
+        compacted += len(rows)
+        logging.info(f"{compacted} clics compactés")
+    return compacted
+
+
+async def restore_clicks(session_factory, paths: list[str], chunk_size: int = 5000) -> tuple[int, int]:
+    """
+    Réinsère en base les clics des archives `paths` (chemins ou motifs glob).
+    Retourne le nombre de clics réinsérés et le nombre de clics non restaurés car leur id
+    est déjà pris par un autre clic (chacun est journalisé).
+    """
+    restored = conflicts = 0
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)):
+            rows = await asyncio.to_thread(_read_archive, path)
+            for start in range(0, len(rows), chunk_size):
+                async with session_factory() as db:
+                    count, clashes = await crud.restore_clicks(db, rows[start:start + chunk_size])
+                restored += count
+                conflicts += len(clashes)
+                for row in clashes:
+                    logging.warning(f"{path} : l'id {row['id']} est déjà pris par un autre clic, clic non restauré : {row}")
+            logging.info(f"{path} restauré")
+    return restored, conflicts
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from crud import crud
+from config import settings
+from database import AsyncSessionLocal
+from schemas.schemas import ThankYouClickCreate
+
+
+class ClickBuffer:
+    """
+    Tampon d'écriture différée pour les clics "merci".
+
+    Les clics reçus sont fusionnés par (dev_id, projet, user_id) puis écrits
+    en une seule insertion groupée :
+    - dès que le nombre de clés en attente atteint `max_keys` ;
+    - toutes les `flush_interval` secondes ;
+    - une dernière fois à l'arrêt de l'application.
+    """
+
+    def __init__(self, session_factory, max_keys: int, flush_interval: float):
+        self._session_factory = session_factory
+        self._max_keys = max_keys
+        self._flush_interval = flush_interval
+        self._pending: dict[tuple[int, str, str], int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def add(self, click: ThankYouClickCreate):
+        """
+        Ajoute un clic au tampon. Si le tampon est plein, attend qu'il soit vidé.
+        """
+        key = (click.dev_id, click.project_name, click.user_id)
+        if key not in self._pending and len(self._pending) >= self._max_keys:
+            await self.flush()
+        self._pending[key] = self._pending.get(key, 0) + click.count
+
+    async def flush(self) -> int:
+        """
+        Écrit en base tous les clics en attente. Retourne le nombre de lignes insérées.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            clicks = [
+                ThankYouClickCreate.model_construct(dev_id=dev_id, project_name=project_name, user_id=user_id, count=count)
+                for (dev_id, project_name, user_id), count in pending.items()
+            ]
+            try:
+                async with self._session_factory() as db:
+                    project_ids = await crud.create_thank_you_clicks_batch(db, clicks)
+                for click, project_id in zip(clicks, project_ids):
+                    if project_id is None:
+                        logging.warning(f"Clics ignorés : le projet '{click.project_name}' de {click.dev_id} est introuvable.")
+                return sum(project_id is not None for project_id in project_ids)
+            except Exception:
+                logging.exception(f"Échec de l'écriture de {len(pending)} clics en attente.")
+                # On remet les clics dans le tampon tant qu'il reste de la place
+                for key, count in pending.items():
+                    if key in self._pending or len(self._pending) < self._max_keys:
+                        self._pending[key] = self._pending.get(key, 0) + count
+                return 0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Arrête l'écriture périodique et vide le tampon une dernière fois.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+click_buffer = ClickBuffer(
+    AsyncSessionLocal,
+    max_keys=settings.click_buffer_max_keys,
+    flush_interval=settings.click_buffer_flush_interval,
+)
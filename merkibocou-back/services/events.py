@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import json
+import logging
+
+from config import settings
+
+
+class Subscription:
+    """
+    Abonnement d'un client au flux d'un développeur.
+    `dropped` passe à True si le client ne lit pas assez vite et que sa file déborde.
+    """
+
+    def __init__(self, developer_id: int, queue_size: int):
+        self.developer_id = developer_id
+        self.queue: asyncio.Queue[tuple[int, str, dict] | None] = asyncio.Queue(queue_size)
+        self.dropped = False
+
+
+class EventBroker:
+    """
+    Pub/sub en mémoire des nouveaux clics et messages, par développeur.
+
+    Chaque abonné a une file bornée de `queue_size` événements : un client trop lent
+    n'accumule pas d'événements en mémoire, il est désabonné et reçoit un événement `resync`
+    lui indiquant de recharger le tableau de bord avant de se reconnecter.
+    Au plus `max_subscribers` flux ouverts par développeur.
+    Les événements ne sont diffusés qu'aux clients connectés à ce processus.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int, heartbeat_seconds: float):
+        self._queue_size = queue_size
+        self._max_subscribers = max_subscribers
+        self._heartbeat_seconds = heartbeat_seconds
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self._ids = itertools.count(1)
+
+    def has_subscribers(self, developer_id: int) -> bool:
+        return developer_id in self._subscribers
+
+    def subscribe(self, developer_id: int) -> Subscription | None:
+        """
+        Ouvre un abonnement, ou retourne None si le développeur a déjà trop de flux ouverts.
+        """
+        subscribers = self._subscribers.setdefault(developer_id, set())
+        if len(subscribers) >= self._max_subscribers:
+            if not subscribers:
+                del self._subscribers[developer_id]
+            return None
+        subscription = Subscription(developer_id, self._queue_size)
+        subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.developer_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.developer_id]
+
+    def publish(self, developer_id: int, event_type: str, data: dict):
+        """
+        Envoie un événement à tous les flux ouverts du développeur, sans jamais attendre.
+        """
+        event_id = next(self._ids)
+        for subscription in list(self._subscribers.get(developer_id, ())):
+            try:
+                subscription.queue.put_nowait((event_id, event_type, data))
+            except asyncio.QueueFull:
+                logging.info(f"Flux d'événements trop lent abandonné (développeur {developer_id})")
+                subscription.dropped = True
+                self.unsubscribe(subscription)
+
+    def publish_many(self, events: list[tuple[int, str, dict]]):
+        for developer_id, event_type, data in events:
+            self.publish(developer_id, event_type, data)
+
+    async def stream(self, subscription: Subscription):
+        """
+        Flux Server-Sent Events d'un abonnement, avec un commentaire de maintien de connexion
+        toutes les `heartbeat_seconds` secondes. Se désabonne à la fermeture.
+        """
+        try:
+            yield "retry: 5000\nevent: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), self._heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if subscription.dropped:
+                    # Des événements ont été perdus : le client doit recharger ses données
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if item is None:
+                    return
+                event_id, event_type, data = item
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def close(self):
+        """
+        Termine tous les flux ouverts (arrêt de l'application).
+        """
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                try:
+                    subscription.queue.put_nowait(None)
+                except asyncio.QueueFull:
+                    subscription.dropped = True
+        self._subscribers.clear()
+
+
+event_broker = EventBroker(
+    queue_size=settings.events_queue_size,
+    max_subscribers=settings.events_max_subscribers,
+    heartbeat_seconds=settings.events_heartbeat_seconds,
+)
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+
+from crud import crud
+
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = ["type", "id", "userId", "clicks", "message", "timestamp"]
+
+
+def _values(row) -> tuple:
+    return row.type, row.id, row.user_id, row.count, row.content, row.timestamp.isoformat()
+
+
+def _csv_chunk(lines) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(lines)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(lines) -> str:
+    return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, line)), ensure_ascii=False) + "\n" for line in lines)
+
+
+async def export_project(session_factory, project_id: int, export_format: str,
+                         since: tuple[int, int], until: tuple[int, int]):
+    """
+    Export d'un projet au format `export_format` ("csv" ou "ndjson"), un morceau de texte par paquet de lignes.
+
+    L'export a sa propre session : il continue après la fin de la requête qui l'a lancé,
+    tant que le client lit la réponse.
+    """
+    if export_format == "csv":
+        yield _csv_chunk([EXPORT_COLUMNS])
+    async with session_factory() as db:
+        async for rows in crud.stream_project_export(db, project_id, since, until):
+            lines = [_values(row) for row in rows]
+            yield _csv_chunk(lines) if export_format == "csv" else _ndjson_chunk(lines)
@@ -0,0 +1,45 @@
+import heapq
+
+
+class SpaceSaving:
+    """
+    Résumé Space-Saving des éléments les plus fréquents d'un flux, en mémoire bornée.
+
+    Au plus `capacity` éléments sont suivis, chacun avec un compte et une erreur maximale :
+    le vrai compte est compris entre `count - error` et `count`. Quand un nouvel élément
+    arrive et que le résumé est plein, il remplace l'élément de plus petit compte et hérite
+    de ce compte comme erreur. Tout élément pesant plus de `total / capacity` est garanti suivi.
+    """
+
+    def __init__(self, capacity: int, counters: dict[str, list[int]] | None = None, total: int = 0):
+        self.capacity = capacity
+        self.counters = counters if counters is not None else {}  # élément -> [compte, erreur]
+        self.total = total
+
+    @classmethod
+    def from_json(cls, capacity: int, data: dict | None) -> "SpaceSaving":
+        if data is None:
+            return cls(capacity)
+        return cls(capacity, {item: list(counter) for item, counter in data["counters"].items()}, data["total"])
+
+    def to_json(self) -> dict:
+        return {"total": self.total, "counters": self.counters}
+
+    def add(self, item: str, weight: int = 1):
+        self.total += weight
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            evicted = min(self.counters, key=lambda key: self.counters[key][0])
+            minimum = self.counters.pop(evicted)[0]
+            self.counters[item] = [minimum + weight, minimum]
+
+    def top(self, n: int) -> list[tuple[str, int, int]]:
+        """
+        Les `n` éléments de plus grand compte : (élément, compte, erreur maximale).
+        """
+        return heapq.nlargest(n, ((item, count, error) for item, (count, error) in self.counters.items()),
+                              key=lambda entry: (entry[1], -entry[2]))
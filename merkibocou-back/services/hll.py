@@ -0,0 +1,105 @@
+import hashlib
+import math
+import zlib
+
+# 2^12 registres d'un octet : erreur type de 1.04 / sqrt(4096) ≈ 1.6 % sur l'estimation
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_STANDARD_ERROR = 1.04 / math.sqrt(HLL_REGISTERS)
+# 2^-rang pour chaque rang possible (au plus 64 - HLL_PRECISION + 1)
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(64 - HLL_PRECISION + 2)]
+# Octet 0x80 répété, pour calculer le maximum registre par registre sur des entiers de 4096 octets
+_HIGH_BITS = int.from_bytes(b"\x80" * HLL_REGISTERS, "big")
+
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog : estimation du nombre d'éléments distincts en mémoire constante (4 Ko).
+
+    L'estimation a une erreur type relative de `HLL_STANDARD_ERROR` (≈ 1.6 %, donc dans ±3.3 %
+    dans 95 % des cas) ; en dessous de quelques milliers d'éléments, le comptage linéaire
+    utilisé pour les petites valeurs est quasiment exact.
+    Deux sketches se fusionnent sans perte (maximum registre par registre), ce qui permet
+    de compter les distincts sur une période à partir des sketches journaliers.
+    """
+
+    def __init__(self, registers: bytes | bytearray | None = None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(HLL_REGISTERS)
+
+    @classmethod
+    def from_blob(cls, blob: bytes | None) -> "HyperLogLog":
+        """
+        Relit un sketch stocké en base (vide si `blob` vaut None).
+        """
+        return cls(zlib.decompress(blob)) if blob is not None else cls()
+
+    def to_blob(self) -> bytes:
+        """
+        Forme compressée stockée en base : quelques octets tant que peu de registres sont remplis.
+        """
+        return zlib.compress(bytes(self.registers))
+
+    def add(self, value: str) -> bool:
+        """
+        Ajoute un élément. Retourne True si un registre a changé (sinon inutile de réécrire le sketch).
+        """
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = hashed >> (64 - HLL_PRECISION)
+        remaining = hashed & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = (64 - HLL_PRECISION) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    @classmethod
+    def union(cls, blobs) -> "HyperLogLog":
+        """
+        Fusion des sketches stockés `blobs` (les None sont ignorés) en un seul.
+        """
+        merged = 0
+        for blob in blobs:
+            if blob is not None:
+                merged = _max_registers(merged, int.from_bytes(zlib.decompress(blob), "big"))
+        return cls(merged.to_bytes(HLL_REGISTERS, "big"))
+
+    def merge(self, other: "HyperLogLog") -> bool:
+        """
+        Fusionne `other` dans ce sketch. Retourne True si un registre a changé.
+        """
+        mine = int.from_bytes(self.registers, "big")
+        merged = _max_registers(mine, int.from_bytes(other.registers, "big"))
+        if merged == mine:
+            return False
+        self.registers = bytearray(merged.to_bytes(HLL_REGISTERS, "big"))
+        return True
+
+    def count(self) -> int:
+        """
+        Estimation du nombre d'éléments distincts ajoutés.
+        """
+        alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+        # Histogramme des rangs : une passe `bytearray.count` par rang, jusqu'à avoir vu tous les registres
+        total, seen = 0.0, 0
+        for rank, inverse_power in enumerate(_INVERSE_POWERS):
+            registers = self.registers.count(rank)
+            total += registers * inverse_power
+            seen += registers
+            if seen == HLL_REGISTERS:
+                break
+        estimate = alpha * HLL_REGISTERS ** 2 / total
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * HLL_REGISTERS and zeros:
+            # Petites valeurs : comptage linéaire, plus précis
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return round(estimate)
+
+
+def _max_registers(mine: int, theirs: int) -> int:
+    """
+    Maximum registre par registre, calculé d'un bloc sur les registres vus comme un seul entier
+    (les rangs tiennent sur 7 bits) : pour chaque octet, (a | 0x80) - b garde son bit de poids fort
+    si et seulement si a >= b, ce qui donne le masque des registres de `mine` à garder.
+    """
+    keep = ((((mine | _HIGH_BITS) - theirs) & _HIGH_BITS) >> 7) * 0xFF
+    return (mine & keep) | (theirs & ~keep)
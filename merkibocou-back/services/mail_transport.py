@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable
+
+import aiosmtplib
+
+from config import settings
+
+
+def build_html_message(subject: str, recipient: str, html: str) -> EmailMessage:
+    """
+    Construit un email HTML prêt à être envoyé.
+    """
+    message = EmailMessage()
+    message["From"] = formataddr((settings.mail_from_name, settings.mail_from))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    message.set_content(html, subtype="html")
+    return message
+
+
+class SMTPPool:
+    """
+    Pool de connexions SMTP persistantes.
+
+    Une connexion (et sa négociation TLS / authentification) est réutilisée
+    pour enchaîner les envois, au lieu d'ouvrir une session par mail.
+    Au plus `size` connexions sont ouvertes en même temps ; une connexion
+    inutilisée depuis plus de `idle_timeout` secondes est refermée.
+    """
+
+    def __init__(self, size: int, idle_timeout: float):
+        self._size = size
+        self._idle_timeout = idle_timeout
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: list[tuple[aiosmtplib.SMTP, float]] = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.mail_server,
+            port=settings.mail_port,
+            use_tls=settings.mail_ssl_tls,
+            start_tls=settings.mail_starttls,
+            validate_certs=settings.mail_validate_certs,
+        )
+        await smtp.connect()
+        if settings.mail_username:
+            await smtp.login(settings.mail_username, settings.mail_password)
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: aiosmtplib.SMTP):
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Prête une connexion du pool, ouverte si besoin, et la rend à la fin.
+        """
+        async with self._semaphore:
+            smtp = None
+            while self._idle:
+                candidate, last_used = self._idle.pop()
+                if candidate.is_connected and time.monotonic() - last_used < self._idle_timeout:
+                    smtp = candidate
+                    break
+                await self._close(candidate)
+            if smtp is None:
+                smtp = await self._connect()
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            self._idle.append((smtp, time.monotonic()))
+
+    async def send(self, message: EmailMessage):
+        """
+        Envoie un message sur une connexion du pool.
+        Si la connexion réutilisée a été coupée par le serveur, on réessaie une fois sur une nouvelle.
+        """
+        try:
+            async with self.connection() as smtp:
+                await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            async with self.connection() as smtp:
+                await smtp.send_message(message)
+
+    async def send_many(self, messages: Iterable[tuple[Any, EmailMessage]] | AsyncIterable[tuple[Any, EmailMessage]],
+                        concurrency: int,
+                        on_sent: Callable[[Any], Awaitable[None]] | None = None) -> tuple[int, int]:
+        """
+        Envoie un flux de couples (clé, message) avec au plus `concurrency` envois en parallèle.
+
+        Chaque envoi réutilise une connexion du pool, donc les messages s'enchaînent
+        sur quelques sessions SMTP. `on_sent` est appelé avec la clé de chaque message
+        envoyé avec succès. Retourne le nombre de messages envoyés et en échec.
+        """
+        iterator = aiter(messages) if isinstance(messages, AsyncIterable) else aiter(_as_async(messages))
+        lock = asyncio.Lock()
+        counts = {"sent": 0, "failed": 0}
+
+        async def worker():
+            while True:
+                async with lock:
+                    item = await anext(iterator, None)
+                if item is None:
+                    return
+                key, message = item
+                try:
+                    await self.send(message)
+                except Exception:
+                    logging.exception(f"Échec de l'envoi du mail à {message['To']}.")
+                    counts["failed"] += 1
+                    continue
+                counts["sent"] += 1
+                if on_sent is not None:
+                    await on_sent(key)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, self._size)))))
+        return counts["sent"], counts["failed"]
+
+    async def close(self):
+        """
+        Ferme toutes les connexions inutilisées.
+        """
+        while self._idle:
+            smtp, _ = self._idle.pop()
+            await self._close(smtp)
+
+
+async def _as_async(items: Iterable):
+    for item in items:
+        yield item
+
+
+smtp_pool = SMTPPool(size=settings.mail_pool_size, idle_timeout=settings.mail_idle_timeout)
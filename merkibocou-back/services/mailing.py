@@ -1,27 +1,17 @@
+import asyncio
+import logging
+
 from fastapi import FastAPI
-from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import JSONResponse
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from pydantic import EmailStr, BaseModel
 from typing import List
 
-from crud.crud import get_developer_by_id, get_developer_summary_mails_to_send, get_project_by_name_and_developer
-from schemas.schemas import DeveloperDetailedResponse, DeveloperMailSummaryResponse, MessageCreate, ThankYouClickCreate
+from crud.crud import stream_developer_summary_mails, summary_cutoff, checkpoint_summary
+from database import AsyncSessionLocal
+from schemas.schemas import DeveloperDetailedResponse, MessageCreate, ThankYouClickCreate
 from jinja2 import Environment, FileSystemLoader
 from config import settings 
-
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME=settings.mail_from_name,
-    MAIL_STARTTLS=settings.mail_starttls,
-    MAIL_SSL_TLS=settings.mail_ssl_tls,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=settings.mail_validate_certs,
-)
+from services.mail_transport import smtp_pool, build_html_message
 
 
 # Initialiser l'environnement avec un dossier de templates
@@ -31,59 +21,73 @@ env = Environment(loader=FileSystemLoader('templates'))
 async def mail_message_to_dev(message: MessageCreate, dev: DeveloperDetailedResponse):
     template = env.get_template("instant_message.html.j2")
     rendered_html = template.render({'username': dev.username, 'project': message.project_name, 'message': message.model_dump()})
-    fm = FastMail(conf)
-    mail = MessageSchema(
+    mail = build_html_message(
         subject=f"Nouveau message pour {message.project_name} avec Merkit Bocou",
-        recipients=[dev.email],
-        body=rendered_html,
-        subtype=MessageType.html
+        recipient=dev.email,
+        html=rendered_html,
     )
-    await fm.send_message(mail)
+    await smtp_pool.send(mail)
 
 
-async def send_instant_thank_you_notification(db: AsyncSession, click: ThankYouClickCreate):
+async def mail_thank_you_to_dev(clicks: list[ThankYouClickCreate], dev: DeveloperDetailedResponse):
     """
-    Envoie un email instantané de remerciement si activé par le développeur.
+    Envoie au développeur un seul email regroupant tous les mercis reçus pendant la fenêtre,
+    avec le total de clics et le nombre de personnes par projet.
     """
-    dev: DeveloperDetailedResponse = await get_developer_by_id(db, click.dev_id)
-    if dev.instant_thank_you:
-        # Récupérer le projet
-        project = await get_project_by_name_and_developer(db, click.project_name, click.dev_id)
+    projects = {}
+    for click in clicks:
+        project = projects.setdefault(click.project_name, {"name": click.project_name, "count": 0, "users": set()})
+        project["count"] += click.count
+        project["users"].add(click.user_id)
+    projects = sorted(
+        ({"name": p["name"], "count": p["count"], "user_count": len(p["users"])} for p in projects.values()),
+        key=lambda p: p["count"],
+        reverse=True,
+    )
 
-        # Construire le contenu du mail
-        template = env.get_template("instant_thank_you.html.j2")
-        rendered_html = template.render({
-            "username": dev.username,
-            "project_name": project.name,
-            "thank_you": click.model_dump()
-        })
+    # Construire le contenu du mail
+    template = env.get_template("instant_thank_you.html.j2")
+    rendered_html = template.render({
+        "username": dev.username,
+        "projects": projects,
+        "total_count": sum(p["count"] for p in projects),
+    })
 
-        # Préparer et envoyer le mail
-        fm = FastMail(conf)
-        mail = MessageSchema(
-            subject=f"Merci reçu pour {project.name} avec Merkit Bocou",
-            recipients=[dev.email],
-            body=rendered_html,
-            subtype=MessageType.html
-        )
-        await fm.send_message(mail)
+    # Préparer et envoyer le mail
+    subject = (f"Merci reçu pour {projects[0]['name']} avec Merkit Bocou" if len(projects) == 1
+               else f"Mercis reçus pour {len(projects)} projets avec Merkit Bocou")
+    mail = build_html_message(subject=subject, recipient=dev.email, html=rendered_html)
+    await smtp_pool.send(mail)
 
 
-async def send_summary_mail_to_all(db: AsyncSession):
+async def send_summary_mail_to_all(shard: tuple[int, int] | None = None):
+    """
+    Envoie le résumé à tous les développeurs concernés (ou seulement à ceux du `shard` donné).
+
+    Les résumés sont rendus et envoyés au fur et à mesure qu'ils sortent de la base,
+    avec au plus `mail_concurrency` envois en parallèle sur les connexions du pool.
+    Le `last_summary_sent` de chaque développeur n'avance qu'après l'envoi réussi de son résumé :
+    une exécution interrompue reprend là où elle s'est arrêtée.
+    """
     template = env.get_template('summary_mail.html.j2')
-    mails_to_send_data: list[DeveloperMailSummaryResponse] = await get_developer_summary_mails_to_send(db)
-    fm = FastMail(conf)
+    cutoff = summary_cutoff()
+    checkpoint_lock = asyncio.Lock()
 
-    for mail_data in mails_to_send_data:
-        rendered_html = template.render(mail_data.model_dump())
-        
-        # Créer le message
-        message = MessageSchema(
-            subject="Résumé MerkitBocou",
-            recipients=[mail_data.email],  # Utiliser l'email du développeur
-            body=rendered_html,
-            subtype=MessageType.html  # Indique qu'on envoie un email HTML
-        )
-        # Envoyer le message
-        await fm.send_message(message)
+    async def checkpoint(developer_id: int):
+        async with checkpoint_lock, AsyncSessionLocal() as checkpoint_db:
+            await checkpoint_summary(checkpoint_db, developer_id, cutoff)
 
+    async with AsyncSessionLocal() as db:
+        messages = (
+            (
+                mail_data.id,
+                build_html_message(
+                    subject="Résumé MerkitBocou",
+                    recipient=mail_data.email,  # Utiliser l'email du développeur
+                    html=template.render(mail_data.model_dump()),
+                ),
+            )
+            async for mail_data in stream_developer_summary_mails(db, cutoff, shard)
+        )
+        sent, failed = await smtp_pool.send_many(messages, concurrency=settings.mail_concurrency, on_sent=checkpoint)
+    logging.info(f"Résumés envoyés : {sent}, en échec : {failed}")
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+
+from crud import crud
+from config import settings
+from database import AsyncSessionLocal
+from models.notification_outbox import NotificationOutbox
+from schemas.schemas import DeveloperDetailedResponse, MessageCreate, ThankYouClickCreate
+from services.mailing import mail_message_to_dev, mail_thank_you_to_dev
+
+
+class OutboxWorker:
+    """
+    Worker qui vide la table `notification_outbox` par lots.
+
+    Chaque lot est réservé en base, envoyé avec au plus `concurrency` mails en parallèle,
+    puis supprimé. Les mercis d'un même développeur partent dans un seul mail. Une notification en échec est retentée avec un délai exponentiel
+    et passe en "dead" après `max_attempts` tentatives.
+    """
+
+    def __init__(self, session_factory, batch_size: int, concurrency: int, poll_interval: float,
+                 max_attempts: int, retry_base_delay: float, lease_seconds: float):
+        self._session_factory = session_factory
+        self._batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._retry_base_delay = retry_base_delay
+        self._lease_seconds = lease_seconds
+        self._task: asyncio.Task | None = None
+
+    async def _deliver(self, notifications: list[NotificationOutbox], dev: DeveloperDetailedResponse | None):
+        """
+        Envoie une notification (ou un groupe de mercis) si le développeur l'a activée.
+        """
+        if dev is None:
+            return
+        async with self._semaphore:
+            if notifications[0].kind == "message" and dev.instant_messages:
+                await mail_message_to_dev(MessageCreate.model_validate(notifications[0].payload), dev)
+            elif notifications[0].kind == "thank_you" and dev.instant_thank_you:
+                clicks = [ThankYouClickCreate.model_validate(notification.payload) for notification in notifications]
+                await mail_thank_you_to_dev(clicks, dev)
+
+    async def process_batch(self) -> int:
+        """
+        Traite un lot de notifications. Retourne le nombre de notifications réservées.
+
+        Chaque message part dans son propre mail, les mercis sont regroupés en un mail par développeur.
+        """
+        async with self._session_factory() as db:
+            notifications = await crud.claim_notifications(db, self._batch_size, self._lease_seconds)
+            if not notifications:
+                return 0
+            devs = {}
+            for developer_id in {notification.developer_id for notification in notifications}:
+                devs[developer_id] = await crud.get_developer_by_id(db, developer_id)
+
+            groups: list[list[NotificationOutbox]] = []
+            thank_you_groups: dict[int, list[NotificationOutbox]] = {}
+            for notification in notifications:
+                if notification.kind == "thank_you":
+                    if notification.developer_id not in thank_you_groups:
+                        thank_you_groups[notification.developer_id] = []
+                        groups.append(thank_you_groups[notification.developer_id])
+                    thank_you_groups[notification.developer_id].append(notification)
+                else:
+                    groups.append([notification])
+
+            results = await asyncio.gather(
+                *(self._deliver(group, devs[group[0].developer_id]) for group in groups),
+                return_exceptions=True,
+            )
+            done_ids = []
+            failures = []
+            for group, result in zip(groups, results):
+                if isinstance(result, Exception):
+                    logging.warning(f"Échec des notifications {[n.id for n in group]} : {result!r}")
+                    failures.extend((notification, repr(result)) for notification in group)
+                else:
+                    done_ids.extend(notification.id for notification in group)
+            await crud.complete_notifications(db, done_ids, failures, self._max_attempts, self._retry_base_delay)
+            return len(notifications)
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logging.exception("Erreur du worker de notifications.")
+                processed = 0
+            # On enchaîne les lots tant qu'il y a du travail
+            if processed < self._batch_size:
+                await asyncio.sleep(self._poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Arrête le worker. Les notifications en cours restent réservées
+        et seront reprises à l'expiration de leur réservation.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+outbox_worker = OutboxWorker(
+    AsyncSessionLocal,
+    batch_size=settings.outbox_batch_size,
+    concurrency=settings.outbox_concurrency,
+    poll_interval=settings.outbox_poll_interval,
+    max_attempts=settings.outbox_max_attempts,
+    retry_base_delay=settings.outbox_retry_base_delay,
+    lease_seconds=settings.outbox_lease_seconds,
+)
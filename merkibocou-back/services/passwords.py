@@ -0,0 +1,59 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from config import settings
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Trop de calculs de mots de passe en attente : la requête est refusée plutôt que mise en file.
+    """
+
+
+class PasswordHasher:
+    """
+    Hachage et vérification bcrypt hors de la boucle asyncio.
+
+    Un calcul bcrypt prend des dizaines à des centaines de millisecondes : exécuté dans un handler,
+    il bloque toutes les requêtes en cours. Les calculs tournent ici dans `workers` threads
+    (bcrypt libère le GIL). Au-delà de `max_pending` calculs en cours ou en attente, les suivants
+    sont refusés avec `PasswordHasherBusy` : une rafale de connexions ne fait pas grossir la file
+    ni le temps de réponse de tout le monde.
+    """
+
+    def __init__(self, rounds: int, workers: int, max_pending: int):
+        self._context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._max_pending = max_pending
+        self._pending = 0
+
+    async def _run(self, function, *args):
+        if self._pending >= self._max_pending:
+            raise PasswordHasherBusy()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Vérifie le mot de passe. Si le hash a été calculé avec un autre facteur de coût que celui
+        configuré, retourne aussi le nouveau hash à enregistrer (sinon None).
+        """
+        return await self._run(self._context.verify_and_update, password, hashed_password)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.password_bcrypt_rounds,
+    workers=settings.password_workers,
+    max_pending=settings.password_max_pending,
+)
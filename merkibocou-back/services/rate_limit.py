@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+from config import settings
+
+
+class TokenBucketLimiter:
+    """
+    Limiteur de débit en mémoire, un seau de jetons par clé.
+
+    Un seau limité à `per_minute` requêtes par minute contient au plus `per_minute` jetons
+    et se remplit à ce rythme : un client peut envoyer une minute de requêtes d'un coup, puis
+    suit le rythme configuré. Au plus `max_keys` seaux sont gardés, les moins récemment
+    utilisés sont oubliés (un seau inutilisé depuis une minute est plein de toute façon).
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.rejected = 0
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()  # clé -> (jetons, instant)
+
+    def _tokens(self, key: Hashable, per_minute: float, now: float) -> float:
+        capacity = max(per_minute, 1.0)
+        entry = self._buckets.get(key)
+        if entry is None:
+            return capacity
+        tokens, updated_at = entry
+        return min(capacity, tokens + (now - updated_at) * per_minute / 60)
+
+    def acquire(self, limits: list[tuple[Hashable, float]]) -> float:
+        """
+        Prend un jeton dans chacun des seaux `limits` (clé, requêtes par minute), dans tous ou dans aucun.
+        Une limite à 0 est désactivée. Retourne 0 si la requête est acceptée,
+        sinon le nombre de secondes à attendre avant qu'elle le soit.
+        """
+        now = time.monotonic()
+        levels = [(key, per_minute, self._tokens(key, per_minute, now)) for key, per_minute in limits if per_minute > 0]
+        wait = max(((1 - tokens) * 60 / per_minute for _, per_minute, tokens in levels), default=0.0)
+        if wait > 0:
+            self.rejected += 1
+            return wait
+        for key, _, tokens in levels:
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        self.allowed += 1
+        return 0.0
+
+    def clear(self):
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "rejected": self.rejected, "size": len(self._buckets), "max_size": self.max_keys}
+
+
+rate_limiter = TokenBucketLimiter(max_keys=settings.rate_limit_max_keys)
@@ -0,0 +1,89 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+from crud import crud
+from config import settings
+from database import AsyncSessionLocal
+from services.mailing import send_summary_mail_to_all
+
+
+class SummaryScheduler:
+    """
+    Planificateur des résumés intégré à l'application.
+
+    Les développeurs sont répartis en `shards` groupes (id modulo `shards`) et un seul groupe
+    est traité par créneau de `tick_seconds` secondes : la charge base de données et SMTP
+    est étalée sur tout le cycle au lieu d'arriver d'un coup.
+    Le shard d'un créneau est déduit de l'heure, donc toutes les instances sont d'accord ;
+    un verrou en base garantit qu'une seule d'entre elles le traite.
+    """
+
+    def __init__(self, session_factory, shards: int, tick_seconds: float):
+        self._session_factory = session_factory
+        self._shards = shards
+        self._tick_seconds = tick_seconds
+        self._owner = uuid.uuid4().hex
+        self._task: asyncio.Task | None = None
+
+    async def run_slot(self, slot: int):
+        """
+        Traite le shard du créneau `slot` si aucune autre instance ne l'a déjà pris.
+        """
+        shard = slot % self._shards
+        slot_end = datetime.datetime.fromtimestamp((slot + 1) * self._tick_seconds, datetime.UTC).replace(tzinfo=None)
+        async with self._session_factory() as db:
+            # Le verrou est gardé jusqu'à la fin du créneau pour que le shard ne soit traité qu'une fois
+            acquired = await crud.acquire_lock(db, f"summary-shard-{shard}", self._owner, slot_end)
+        if not acquired:
+            return
+        logging.info(f"Envoi des résumés du shard {shard}/{self._shards}")
+        await send_summary_mail_to_all(shard=(shard, self._shards))
+
+    async def run_all(self):
+        """
+        Traite tous les shards l'un après l'autre, pour la route du cron externe.
+        Chaque shard passe par le même verrou que le planificateur (avec un propriétaire propre à cet appel) :
+        un shard déjà pris par le planificateur ou par un autre appel du cron est sauté.
+        """
+        owner = uuid.uuid4().hex
+        for shard in range(self._shards):
+            expires_at = crud._utcnow() + datetime.timedelta(seconds=self._tick_seconds)
+            async with self._session_factory() as db:
+                acquired = await crud.acquire_lock(db, f"summary-shard-{shard}", owner, expires_at)
+            if not acquired:
+                logging.info(f"Shard {shard}/{self._shards} déjà en cours de traitement, ignoré par le cron")
+                continue
+            await send_summary_mail_to_all(shard=(shard, self._shards))
+
+    async def _run(self):
+        while True:
+            slot = int(time.time() // self._tick_seconds)
+            try:
+                await self.run_slot(slot)
+            except Exception:
+                logging.exception("Erreur du planificateur de résumés.")
+            # Attendre le début du créneau suivant
+            await asyncio.sleep(max(0.0, (slot + 1) * self._tick_seconds - time.time()))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+summary_scheduler = SummaryScheduler(
+    AsyncSessionLocal,
+    shards=settings.summary_shards,
+    tick_seconds=settings.summary_tick_seconds,
+)
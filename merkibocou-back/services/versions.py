@@ -0,0 +1,34 @@
+import uuid
+from typing import Iterable
+
+
+class VersionCounters:
+    """
+    Compteurs de version des données du tableau de bord, en mémoire.
+
+    Chaque développeur et chaque projet a un compteur, incrémenté après chaque transaction
+    qui ajoute un clic, un message ou un projet. Une version inchangée garantit que les réponses
+    construites avec cette version sont toujours à jour, sans interroger la base.
+    Les versions commencent par un identifiant tiré au démarrage, pour qu'une version
+    d'avant un redémarrage ne corresponde jamais à un compteur remis à zéro.
+    """
+
+    def __init__(self):
+        self._epoch = uuid.uuid4().hex[:12]
+        self._developers: dict[int, int] = {}
+        self._projects: dict[int, int] = {}
+
+    def bump(self, developer_ids: Iterable[int] = (), project_ids: Iterable[int] = ()):
+        for developer_id in developer_ids:
+            self._developers[developer_id] = self._developers.get(developer_id, 0) + 1
+        for project_id in project_ids:
+            self._projects[project_id] = self._projects.get(project_id, 0) + 1
+
+    def developer(self, developer_id: int) -> str:
+        return f"{self._epoch}-d{developer_id}-{self._developers.get(developer_id, 0)}"
+
+    def project(self, project_id: int) -> str:
+        return f"{self._epoch}-p{project_id}-{self._projects.get(project_id, 0)}"
+
+
+versions = VersionCounters()